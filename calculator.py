@@ -2,6 +2,31 @@
 ماژول محاسبه هزینه خدمات بر اساس کایها - نسخه جدید برای all.xlsx
 """
 
+from collections import OrderedDict
+
+import numpy as np
+
+
+# ترتیب ثابت 6 ضریب کای (برای کلید کش جدول قیمت)
+COEFFICIENT_KEYS = (
+    'کای حرفه‌ای # دار',
+    'کای فنی # دار',
+    'کای حرفه‌ای بدون #',
+    'کای فنی بدون #',
+    'کای حرفه‌ای دولتی',
+    'کای فنی دولتی',
+)
+
+DEFAULT_COEFFICIENTS = {
+    'کای حرفه‌ای # دار': 568000,
+    'کای فنی # دار': 1777000,
+    'کای حرفه‌ای بدون #': 1011000,
+    'کای فنی بدون #': 2843000,
+    'کای حرفه‌ای دولتی': 302000,
+    'کای فنی دولتی': 428000
+}
+
+
 class PriceCalculator:
     """محاسبه قیمت خدمات براساس ضرایب کای"""
     
@@ -79,6 +104,86 @@ class PriceCalculator:
             'has_insurance': True
         }
     
+    def calculate_prices_batch(self, professional_values, technical_values, has_hash):
+        """
+        محاسبه برداری قیمت همه خدمات در یک مرحله (همان فرمول و گرد کردن calculate_service_price)
+        
+        Args:
+            professional_values: آرایه ضرایب حرفه‌ای
+            technical_values: آرایه ضرایب فنی
+            has_hash: آرایه بولی - خدمت # دار است؟ (hash_mask)
+            
+        Returns:
+            dict: آرایه‌های int64 برای private, insurance, organization, government, government_70
+        """
+        prof = np.asarray(professional_values, dtype=np.float64)
+        tech = np.asarray(technical_values, dtype=np.float64)
+        has_hash = np.asarray(has_hash, dtype=bool)
+        
+        kai_prof = np.where(
+            has_hash,
+            self.coef.get('کای حرفه‌ای # دار', 568000),
+            self.coef.get('کای حرفه‌ای بدون #', 1011000)
+        )
+        kai_tech = np.where(
+            has_hash,
+            self.coef.get('کای فنی # دار', 1777000),
+            self.coef.get('کای فنی بدون #', 2843000)
+        )
+        kai_prof_gov = self.coef.get('کای حرفه‌ای دولتی', 302000)
+        kai_tech_gov = self.coef.get('کای فنی دولتی', 428000)
+        
+        private_price = (prof * kai_prof) + (tech * kai_tech)
+        government_price = (prof * kai_prof_gov) + (tech * kai_tech_gov)
+        organization_share = government_price * 0.7
+        insurance_price = private_price - organization_share
+        
+        # np.rint مثل round پایتون نیمه‌ها را به عدد زوج گرد می‌کند
+        organization = np.rint(organization_share).astype(np.int64)
+        return {
+            'private': np.rint(private_price).astype(np.int64),
+            'insurance': np.rint(insurance_price).astype(np.int64),
+            'organization': organization,
+            'government': np.rint(government_price).astype(np.int64),
+            'government_70': organization.copy(),
+        }
+    
+    @staticmethod
+    def hash_mask(service_types):
+        """آرایه بولی: نوع خدمت شامل '#' است؟"""
+        return np.array([bool(t) and '#' in str(t) for t in service_types], dtype=bool)
+    
+    @staticmethod
+    def apply_anesthesia_batch(prices):
+        """اعمال بی‌حسی موضعی روی قیمت‌های برداری (خصوصی × 1.20، سهم سازمان ثابت)"""
+        prices = dict(prices)
+        # int() پایتون به سمت صفر گرد می‌کند؛ astype هم همین‌طور
+        prices['private'] = (prices['private'] * 1.20).astype(np.int64)
+        prices['insurance'] = prices['private'] - prices['organization']
+        return prices
+    
+    @staticmethod
+    def tariff_columns(prices, tariff_type):
+        """
+        ستون‌های جدول فاکتور (کل، سازمان، بیمار) برای یک نوع تعرفه
+        
+        Returns:
+            dict: آرایه‌های total, organization, patient
+        """
+        if tariff_type == "خصوصی آزاد":
+            total = prices['private']
+            org = np.zeros_like(total)
+            patient = total
+        elif tariff_type == "دولتی":
+            total = prices['government']
+            org = np.zeros_like(total)
+            patient = total
+        else:  # بیمه‌شده
+            total = prices['private']
+            org = prices['organization']
+            patient = prices['insurance']
+        return {'total': total, 'organization': org, 'patient': patient}
+    
     @staticmethod
     def load_coefficients_from_file(file_path='coefficients.json'):
         """بارگذاری ضرایب از فایل"""
@@ -93,14 +198,7 @@ class PriceCalculator:
                 pass
         
         # مقادیر پیشفرض
-        return {
-            'کای حرفه‌ای # دار': 568000,
-            'کای فنی # دار': 1777000,
-            'کای حرفه‌ای بدون #': 1011000,
-            'کای فنی بدون #': 2843000,
-            'کای حرفه‌ای دولتی': 302000,
-            'کای فنی دولتی': 428000
-        }
+        return dict(DEFAULT_COEFFICIENTS)
     
     @staticmethod
     def save_coefficients_to_file(coefficients, file_path='coefficients.json'):
@@ -109,3 +207,71 @@ class PriceCalculator:
         
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(coefficients, f, ensure_ascii=False, indent=2)
+
+
+class PriceTableCache:
+    """
+    کش جدول قیمت کل کاتالوگ به ازای هر مجموعه ضرایب کای + بی‌حسی موضعی
+    
+    جدول هر مجموعه ضرایب یک بار به صورت برداری ساخته می‌شود؛ برگشت به ضرایب قبلی
+    از همان جدول استفاده می‌کند و قدیمی‌ترین جدول‌ها (LRU) حذف می‌شوند.
+    """
+    
+    def __init__(self, max_tables=8):
+        self.max_tables = max_tables
+        self.tables = OrderedDict()
+        self.catalog = None  # (ضرایب حرفه‌ای، ضرایب فنی، ماسک #)
+        self.hits = 0
+        self.misses = 0
+    
+    def set_catalog(self, professional_values, technical_values, has_hash):
+        """تنظیم کاتالوگ جدید - جدول‌های کاتالوگ قبلی دیگر معتبر نیستند"""
+        self.catalog = (
+            np.asarray(professional_values, dtype=np.float64),
+            np.asarray(technical_values, dtype=np.float64),
+            np.asarray(has_hash, dtype=bool),
+        )
+        self.tables = OrderedDict()
+    
+    def clear(self):
+        """حذف کاتالوگ و همه جدول‌ها"""
+        self.catalog = None
+        self.tables = OrderedDict()
+    
+    @staticmethod
+    def make_key(coefficients, anesthesia=False):
+        """کلید کش: مقدار 6 ضریب کای (با ترتیب ثابت) + بی‌حسی"""
+        values = tuple(
+            float(coefficients.get(k, DEFAULT_COEFFICIENTS[k])) for k in COEFFICIENT_KEYS
+        )
+        return values + (bool(anesthesia),)
+    
+    def get(self, calculator, anesthesia=False):
+        """
+        جدول قیمت کاتالوگ برای ضرایب calculator
+        
+        Returns:
+            dict: آرایه‌های فقط‌خواندنی private, insurance, organization, government, government_70
+            یا None اگر کاتالوگی تنظیم نشده باشد
+        """
+        if self.catalog is None:
+            return None
+        
+        key = self.make_key(calculator.coef, anesthesia)
+        table = self.tables.get(key)
+        if table is not None:
+            self.tables.move_to_end(key)
+            self.hits += 1
+            return table
+        
+        self.misses += 1
+        table = calculator.calculate_prices_batch(*self.catalog)
+        if anesthesia:
+            table = PriceCalculator.apply_anesthesia_batch(table)
+        for values in table.values():
+            values.flags.writeable = False  # جدول بین چند کلید/فراخوانی مشترک است
+        
+        self.tables[key] = table
+        while len(self.tables) > self.max_tables:
+            self.tables.popitem(last=False)
+        return table
@@ -0,0 +1,315 @@
+"""
+کش باینری کاتالوگ تعرفه‌ها (all.xlsx)
+کاتالوگ نرمال‌شده یک بار در یک فایل ستونی فشرده ذخیره می‌شود و در اجراهای بعدی
+به‌جای پارس دوباره اکسل، همان فایل با mmap خوانده می‌شود.
+اکسل فقط وقتی دوباره خوانده می‌شود که اندازه، زمان تغییر یا هش آن عوض شده باشد.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+
+# نام ستون‌های کاتالوگ نرمال‌شده (همان نام‌هایی که رابط اصلی استفاده می‌کند)
+CODE_COL = 'کدملی'
+FEATURE_COL = 'ویژگی کد'
+NAME_COL = 'شرح کد'
+PROF_COL = 'حرفهای'
+TECH_COL = 'فنی'
+ANESTHESIA_COL = 'ارزش پایه بیهوشی'
+
+# ستون محاسبه‌شده هنگام بارگذاری (در کش ذخیره نمی‌شود)
+CATEGORY_COL = 'دسته'
+
+TEXT_COLUMNS = [CODE_COL, FEATURE_COL, NAME_COL]
+NUMERIC_COLUMNS = [PROF_COL, TECH_COL, ANESTHESIA_COL]
+CATALOG_COLUMNS = TEXT_COLUMNS + NUMERIC_COLUMNS
+
+# هدرهای فایل all.xlsx (دو سطر اول فایل عنوان هستند)
+ALL_XLSX_COLUMNS = [CODE_COL, FEATURE_COL, NAME_COL, 'توضیحات', 'کل', PROF_COL, TECH_COL, ANESTHESIA_COL]
+
+# تعداد ردیف هر تکه هنگام خواندن جریانی اکسل
+CHUNK_ROWS = 500
+
+CACHE_MAGIC = b"SONOCAT1"
+CACHE_VERSION = 1
+
+
+def _clean_header(name):
+    """حذف نیم‌فاصله، فاصله و پرانتز انگلیسی از نام ستون (مثلاً «کدملی(Code)»)"""
+    name = str(name).split("(")[0]
+    return name.replace("‌", "").replace(" ", "").strip()
+
+
+def _clean_code(value):
+    """تبدیل کدملی به رشته تمیز (701500.0 -> 701500)"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    code = str(value).strip()
+    if code.endswith(".0"):
+        code = code[:-2]
+    return code
+
+
+def normalize_catalog(df, title_rows=2):
+    """
+    تبدیل دیتافریم خام اکسل به کاتالوگ نرمال‌شده
+
+    هم فایل all.xlsx (بدون هدر) و هم ساختار قدیمی ghardash.xlsx را پشتیبانی می‌کند.
+    title_rows: تعداد سطرهای عنوان all.xlsx در ابتدای df (برای تکه‌های بعدی 0)
+
+    Returns:
+        DataFrame: ستون‌های CATALOG_COLUMNS با متن تمیز و اعداد float
+    """
+    if 'Unnamed: 0' in df.columns:
+        # فایل all.xlsx - نیاز به تنظیم هدرها
+        df = df.copy()
+        df.columns = ALL_XLSX_COLUMNS
+        df = df.iloc[title_rows:].reset_index(drop=True)  # حذف دو سطر اول
+    else:
+        # فایل ghardash.xlsx - تطبیق ستون‌ها با نام استاندارد
+        wanted = {_clean_header(c): c for c in CATALOG_COLUMNS}
+        rename = {}
+        for col in df.columns:
+            key = _clean_header(col)
+            if key in wanted and wanted[key] not in rename.values():
+                rename[col] = wanted[key]
+        df = df.rename(columns=rename)
+
+    df = df.dropna(subset=[CODE_COL]) if CODE_COL in df.columns else df
+
+    catalog = pd.DataFrame(index=range(len(df)))
+    for col in TEXT_COLUMNS:
+        if col not in df.columns:
+            catalog[col] = ""
+        elif col == CODE_COL:
+            catalog[col] = [_clean_code(v) for v in df[col]]
+        else:
+            catalog[col] = df[col].fillna("").astype(str).str.strip().to_numpy()
+
+    for col in NUMERIC_COLUMNS:
+        if col not in df.columns:
+            catalog[col] = 0.0
+        else:
+            values = pd.to_numeric(df[col], errors='coerce')
+            catalog[col] = values.fillna(0.0).astype(float).to_numpy()
+
+    # خدمات بدون شرح در لیست قابل نمایش نیستند
+    names = catalog[NAME_COL]
+    catalog = catalog[(names != "") & (names != "nan")].reset_index(drop=True)
+    return catalog
+
+
+def read_catalog_excel(excel_path):
+    """خواندن اکسل تعرفه و نرمال‌سازی آن (مسیر کند، بدون کش)"""
+    return normalize_catalog(pd.read_excel(excel_path))
+
+
+def read_catalog_chunks(excel_path, chunk_size=CHUNK_ROWS):
+    """
+    خواندن جریانی اکسل تعرفه (openpyxl فقط‌خواندنی) - هر تکه یک کاتالوگ نرمال‌شده
+
+    نام ستون‌ها مثل pd.read_excel از سطر اول ساخته می‌شود (ستون بی‌نام = «Unnamed: i»)
+    تا normalize_catalog روی هر تکه همان نتیجه خواندن یک‌جا را بدهد.
+    """
+    wb = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [f"Unnamed: {i}" if name is None else name for i, name in enumerate(header)]
+        width = len(columns)
+        title_rows = 2
+        chunk = []
+        for values in rows:
+            values = tuple(values[:width])
+            if len(values) < width:
+                values += (None,) * (width - len(values))
+            chunk.append(values)
+            if len(chunk) >= chunk_size:
+                yield normalize_catalog(pd.DataFrame(chunk, columns=columns), title_rows)
+                title_rows = 0
+                chunk = []
+        if chunk:
+            yield normalize_catalog(pd.DataFrame(chunk, columns=columns), title_rows)
+    finally:
+        wb.close()
+
+
+def file_sha1(path):
+    """هش SHA1 محتوای فایل"""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class CatalogCache:
+    """کش ستونی کاتالوگ تعرفه با ابطال بر اساس اندازه/زمان تغییر/هش فایل اکسل"""
+
+    def __init__(self, cache_dir="catalog_cache"):
+        # پوشه کش کنار فایل تنظیمات؛ برای هر فایل اکسل یک فایل کش جدا
+        self.cache_dir = cache_dir
+
+    def cache_path(self, excel_path):
+        """مسیر فایل کش مخصوص یک فایل اکسل"""
+        key = hashlib.sha1(os.path.abspath(excel_path).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{key}.bin")
+
+    def load(self, excel_path):
+        """
+        بارگذاری کاتالوگ - از کش در صورت معتبر بودن، وگرنه از اکسل
+
+        Returns:
+            DataFrame: کاتالوگ نرمال‌شده
+        """
+        catalog = self.load_cached(excel_path)
+        if catalog is None:
+            catalog = read_catalog_excel(excel_path)
+            self.store(excel_path, catalog)
+        return catalog
+
+    def load_cached(self, excel_path):
+        """
+        کاتالوگ از کش اگر هنوز با فایل اکسل هم‌خوان باشد
+
+        Returns:
+            DataFrame یا None (کش نیست یا کهنه است - اکسل باید خوانده شود)
+        """
+        st = os.stat(excel_path)
+        cache_path = self.cache_path(excel_path)
+        header = self._read_header(cache_path)
+        if not header:
+            return None
+
+        source = header['source']
+        if source['size'] == st.st_size and source['mtime_ns'] == st.st_mtime_ns:
+            catalog = self._read_columns(cache_path, header)
+            if catalog is not None:
+                return catalog
+
+        # زمان تغییر عوض شده (مثلاً کپی فایل) ولی شاید محتوا همان باشد
+        sha1 = file_sha1(excel_path)
+        if source['size'] == st.st_size and source['sha1'] == sha1:
+            catalog = self._read_columns(cache_path, header)
+            if catalog is not None:
+                self.store(excel_path, catalog, sha1=sha1)
+                return catalog
+        return None
+
+    def store(self, excel_path, catalog, sha1=None):
+        """نوشتن کاتالوگ نرمال‌شده در فایل کش (نوشتن اتمیک)"""
+        try:
+            st = os.stat(excel_path)
+            header = {
+                'version': CACHE_VERSION,
+                'source': {
+                    'path': os.path.abspath(excel_path),
+                    'size': st.st_size,
+                    'mtime_ns': st.st_mtime_ns,
+                    'sha1': sha1 or file_sha1(excel_path),
+                },
+                'rows': len(catalog),
+                'columns': [],
+            }
+
+            blocks = []
+            offset = 0
+            for col in CATALOG_COLUMNS:
+                if col in TEXT_COLUMNS:
+                    values = [str(v) for v in catalog[col]]
+                    lengths = np.fromiter((len(v) for v in values), dtype=np.int64, count=len(values))
+                    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+                    np.cumsum(lengths, out=offsets[1:])
+                    blob = "".join(values).encode('utf-8')
+                    parts = [('offsets', offsets.tobytes()), ('data', blob)]
+                    kind = 'str'
+                else:
+                    parts = [('data', np.ascontiguousarray(catalog[col], dtype='<f8').tobytes())]
+                    kind = 'f8'
+
+                entry = {'name': col, 'kind': kind}
+                for part_name, raw in parts:
+                    entry[part_name] = [offset, len(raw)]
+                    blocks.append(raw)
+                    pad = (-len(raw)) % 8
+                    if pad:
+                        blocks.append(b"\0" * pad)
+                    offset += len(raw) + pad
+                header['columns'].append(entry)
+
+            header_raw = json.dumps(header, ensure_ascii=False).encode('utf-8')
+            header_raw += b" " * ((-len(header_raw)) % 8)
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            cache_path = self.cache_path(excel_path)
+            # نام موقت یکتا برای هر thread (worker قبلی ممکن است هنوز در حال نوشتن باشد)
+            tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(CACHE_MAGIC)
+                f.write(struct.pack('<Q', len(header_raw)))
+                f.write(header_raw)
+                for raw in blocks:
+                    f.write(raw)
+            os.replace(tmp_path, cache_path)
+            return True
+        except Exception as e:
+            print(f"⚠️ خطا در ذخیره کش کاتالوگ: {e}")
+            return False
+
+    def invalidate(self, excel_path):
+        """حذف کش یک فایل اکسل"""
+        try:
+            os.remove(self.cache_path(excel_path))
+        except OSError:
+            pass
+
+    def _read_header(self, cache_path):
+        """خواندن سربرگ فایل کش (بدون خواندن داده‌ها)"""
+        try:
+            with open(cache_path, 'rb') as f:
+                if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+                    return None
+                (header_len,) = struct.unpack('<Q', f.read(8))
+                header = json.loads(f.read(header_len).decode('utf-8'))
+            if header.get('version') != CACHE_VERSION:
+                return None
+            header['data_start'] = len(CACHE_MAGIC) + 8 + header_len
+            return header
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def _read_columns(self, cache_path, header):
+        """خواندن ستون‌ها با mmap"""
+        try:
+            start = header['data_start']
+            rows = header['rows']
+            catalog = {}
+            with open(cache_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for entry in header['columns']:
+                    data_off, data_len = entry['data']
+                    if entry['kind'] == 'f8':
+                        # کپی تا فایل بعد از بستن mmap قابل جایگزینی باشد (ویندوز)
+                        catalog[entry['name']] = np.frombuffer(
+                            mm, dtype='<f8', count=rows, offset=start + data_off
+                        ).astype(float)
+                    else:
+                        offs_off, _ = entry['offsets']
+                        offsets = np.frombuffer(mm, dtype='<i8', count=rows + 1, offset=start + offs_off).tolist()
+                        text = mm[start + data_off:start + data_off + data_len].decode('utf-8')
+                        catalog[entry['name']] = [text[offsets[i]:offsets[i + 1]] for i in range(rows)]
+            return pd.DataFrame(catalog, columns=CATALOG_COLUMNS)
+        except Exception as e:
+            print(f"⚠️ کش کاتالوگ خراب است: {e}")
+            return None
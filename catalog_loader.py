@@ -0,0 +1,68 @@
+"""
+بارگذاری کاتالوگ تعرفه در پس‌زمینه
+پنجره اصلی بلافاصله نمایش داده می‌شود؛ در خواندن اکسل (بدون کش) ردیف‌ها تکه‌تکه به
+لیست خدمات اضافه می‌شوند و جستجو/افزودن خدمت بعد از ساخت ایندکس فعال می‌شود
+"""
+
+import pandas as pd
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from catalog_cache import CATALOG_COLUMNS, CODE_COL, NAME_COL, CATEGORY_COL, read_catalog_chunks
+from search_index import ServiceSearchIndex
+
+
+def prepare_catalog(df, category_filter):
+    """
+    محاسبه دسته هر خدمت و ساخت ایندکس جستجو - یک بار برای هر بارگذاری کاتالوگ
+
+    ستون categorical دسته به df اضافه می‌شود.
+
+    Returns:
+        ServiceSearchIndex
+    """
+    codes = df[CODE_COL].tolist()
+    names = df[NAME_COL].tolist()
+    categories = category_filter.categorize_catalog(codes, names)
+    df[CATEGORY_COL] = categories
+    return ServiceSearchIndex(codes, names, category_filter.build_category_index(categories))
+
+
+class CatalogLoadWorker(QThread):
+    """Worker thread برای خواندن کاتالوگ (از کش یا اکسل) و ساخت ایندکس جستجو"""
+    rows_ready = pyqtSignal(list, list)          # کدها و شرح‌های یک تکه (فقط در خواندن اکسل)
+    catalog_ready = pyqtSignal(object, object)   # DataFrame کاتالوگ، ServiceSearchIndex
+    error = pyqtSignal(str)
+
+    def __init__(self, catalog_cache, excel_path, category_filter):
+        super().__init__()
+        self.catalog_cache = catalog_cache
+        self.excel_path = excel_path
+        self.category_filter = category_filter
+
+    def run(self):
+        try:
+            df = self.catalog_cache.load_cached(self.excel_path)
+            if df is None:
+                df = self.read_excel_progressive()
+                if df is None:
+                    return
+            if self.isInterruptionRequested():
+                return
+            search_index = prepare_catalog(df, self.category_filter)
+            if not self.isInterruptionRequested():
+                self.catalog_ready.emit(df, search_index)
+        except Exception as e:
+            self.error.emit(str(e))
+
+    def read_excel_progressive(self):
+        """خواندن جریانی اکسل و ارسال هر تکه به لیست خدمات (None اگر متوقف شود)"""
+        chunks = []
+        for chunk in read_catalog_chunks(self.excel_path):
+            if self.isInterruptionRequested():
+                return None
+            chunks.append(chunk)
+            self.rows_ready.emit(chunk[CODE_COL].tolist(), chunk[NAME_COL].tolist())
+
+        df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=CATALOG_COLUMNS)
+        self.catalog_cache.store(self.excel_path, df)
+        return df
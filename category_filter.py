@@ -1,24 +1,127 @@
 """
 ماژول دسته بندی خدمات - با دسته سونوگرافی و تصویربرداری
+دسته‌های کلیدواژه‌ای (پیشفرض + دسته‌های کاربر از custom_categories.json)
+با یک ماشین Aho–Corasick در یک پیمایش متن تشخیص داده می‌شوند
 """
 
+import json
+import os
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+# کلیدواژه‌های دسته‌های پیشفرض (ترتیب = اولویت)
+DEFAULT_KEYWORD_CATEGORIES = {
+    "💉 آزمایش": ["آزمایش", "تست", "سرم", "کشت", "نمونه"],
+    "🦷 دندان": ["دندان", "دهان", "فک", "لثه"],
+    "👁️ چشم": ["چشم", "بینایی", "عینک"],
+    "💊 دارو": ["دارو", "قرص", "شربت", "کپسول"],
+}
+
+
+class KeywordAutomaton:
+    """ماشین Aho–Corasick برای یافتن همه کلیدواژه‌های چند دسته در یک پیمایش"""
+
+    def __init__(self, keyword_categories):
+        """
+        Args:
+            keyword_categories: دیکشنری دسته -> لیست کلیدواژه‌ها
+        """
+        goto = [{}]
+        outputs = [set()]
+
+        # درخت کلیدواژه‌ها
+        for category, keywords in keyword_categories.items():
+            for keyword in keywords:
+                if not keyword:
+                    continue
+                state = 0
+                for ch in keyword:
+                    nxt = goto[state].get(ch)
+                    if nxt is None:
+                        nxt = len(goto)
+                        goto[state][ch] = nxt
+                        goto.append({})
+                        outputs.append(set())
+                    state = nxt
+                outputs[state].add(category)
+
+        # پیوندهای شکست (BFS) و تبدیل به جدول انتقال کامل (DFA)
+        # تا هنگام جستجو برای هر حرف فقط یک جستجوی دیکشنری لازم باشد
+        fail = [0] * len(goto)
+        self.delta = [dict(goto[0])]
+        self.delta.extend({} for _ in range(len(goto) - 1))
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            outputs[state] |= outputs[fail[state]]
+            transitions = dict(self.delta[fail[state]])
+            for ch, nxt in goto[state].items():
+                fail[nxt] = self.delta[fail[state]].get(ch, 0)
+                transitions[ch] = nxt
+                queue.append(nxt)
+            self.delta[state] = transitions
+
+        self.outputs = [frozenset(out) for out in outputs]
+
+    def match(self, text):
+        """مجموعه دسته‌هایی که حداقل یک کلیدواژه‌شان در متن آمده است"""
+        delta = self.delta
+        outputs = self.outputs
+        found = set()
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return found
+
+
+def load_custom_categories(file_path='custom_categories.json'):
+    """
+    بارگذاری دسته‌های تعریف‌شده توسط کاربر
+
+    فرمت فایل: {"🫀 قلب": ["قلب", "اکو"], ...}
+    """
+    if not os.path.exists(file_path):
+        return {}
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {
+            str(category): [str(k) for k in keywords if str(k).strip()]
+            for category, keywords in data.items()
+            if isinstance(keywords, list)
+        }
+    except Exception as e:
+        print(f"⚠️ خطا در بارگذاری دسته‌های سفارشی: {e}")
+        return {}
+
 
 class CategoryFilter:
     """فیلتر و دسته بندی خدمات"""
     
-    def __init__(self):
+    def __init__(self, custom_categories_file='custom_categories.json'):
         # محدوده کدهای سونوگرافی: از 701500 تا 701892
         self.sonography_range = (701500, 701892)
-        
+
+        # دسته‌های کلیدواژه‌ای: پیشفرض + دسته‌های کاربر (کلیدواژه دسته تکراری ادغام می‌شود)
+        self.keyword_categories = {c: list(k) for c, k in DEFAULT_KEYWORD_CATEGORIES.items()}
+        for category, keywords in load_custom_categories(custom_categories_file).items():
+            if category in ("همه", "🩻 سونوگرافی", "🏥 تصویربرداری"):
+                continue
+            self.keyword_categories.setdefault(category, []).extend(keywords)
+        self.automaton = KeywordAutomaton(self.keyword_categories)
+
         self.categories = {
             "همه": lambda x: True,
             "🩻 سونوگرافی": self._is_sonography,
             "🏥 تصویربرداری": self._is_imaging,
-            "💉 آزمایش": self._is_lab,
-            "🦷 دندان": self._is_dental,
-            "👁️ چشم": self._is_eye,
-            "💊 دارو": self._is_medicine,
         }
+        for category in self.keyword_categories:
+            self.categories[category] = lambda text, c=category: c in self.automaton.match(text)
     
     def _extract_code(self, text):
         """استخراج کد از متن"""
@@ -45,27 +148,10 @@ class CategoryFilter:
          code = self._extract_code(text)
          return code.startswith('70')
 
-    
-    
-    def _is_lab(self, text):
-        """آزمایش"""
-        keywords = ["آزمایش", "تست", "سرم", "کشت", "نمونه"]
-        return any(k in text for k in keywords)
-    
-    def _is_dental(self, text):
-        """دندان"""
-        keywords = ["دندان", "دهان", "فک", "لثه"]
-        return any(k in text for k in keywords)
-    
-    def _is_eye(self, text):
-        """چشم"""
-        keywords = ["چشم", "بینایی", "عینک"]
-        return any(k in text for k in keywords)
-    
-    def _is_medicine(self, text):
-        """دارو"""
-        keywords = ["دارو", "قرص", "شربت", "کپسول"]
-        return any(k in text for k in keywords)
+
+    def match_keyword_categories(self, text):
+        """همه دسته‌های کلیدواژه‌ای منطبق با متن - یک پیمایش"""
+        return self.automaton.match(text)
     
     def categorize_service(self, service_text):
         """تعیین دسته یک خدمت"""
@@ -77,15 +163,102 @@ class CategoryFilter:
         if self._is_imaging(service_text):
             return "🏥 تصویربرداری"
         
-        # بقیه دسته‌ها
-        for category, check_func in self.categories.items():
-            if category in ["همه", "🩻 سونوگرافی", "🏥 تصویربرداری"]:
-                continue
-            if check_func(service_text):
-                return category
+        # بقیه دسته‌ها - اولین دسته منطبق به ترتیب اولویت
+        matched = self.automaton.match(service_text)
+        if matched:
+            for category in self.keyword_categories:
+                if category in matched:
+                    return category
         
         return "همه"
     
+    def categorize_catalog(self, codes, names):
+        """
+        تعیین دسته همه خدمات کاتالوگ - یک بار هنگام بارگذاری
+
+        Returns:
+            pd.Categorical: دسته ردیف i کاتالوگ
+        """
+        labels = [
+            self.categorize_service(f"{code} - {name}" if code else name)
+            for code, name in zip(codes, names)
+        ]
+        return pd.Categorical(labels, categories=self.get_all_categories())
+
+    @staticmethod
+    def build_category_index(categories):
+        """
+        ایندکس دسته -> مجموعه شماره ردیف‌ها
+
+        Args:
+            categories: خروجی categorize_catalog
+        """
+        codes = np.asarray(categories.codes)
+        index = {
+            category: frozenset(np.flatnonzero(codes == i).tolist())
+            for i, category in enumerate(categories.categories)
+        }
+        # «همه» یعنی بدون فیلتر، نه فقط خدمات بدون دسته
+        index["همه"] = frozenset(range(len(codes)))
+        return index
+
     def get_all_categories(self):
         """دریافت لیست تمام دسته ها"""
         return list(self.categories.keys())
+
+
+def _linear_scan_category(keyword_categories, text):
+    """روش قدیمی: یک پیمایش جدا برای هر دسته (فقط برای مقایسه در بنچمارک)"""
+    for category, keywords in keyword_categories.items():
+        if any(k in text for k in keywords):
+            return category
+    return None
+
+
+def benchmark_keyword_matching(excel_path='all.xlsx', repeat=5, extra_keywords=0):
+    """
+    مقایسه ماشین Aho–Corasick با پیمایش جداگانه کلیدواژه‌ها روی کل کاتالوگ
+
+    Args:
+        extra_keywords: تعداد کلیدواژه ساختگی اضافه (شبیه‌سازی دسته‌های زیاد کاربر)
+    """
+    import time
+    from catalog_cache import CatalogCache, CODE_COL, NAME_COL
+
+    df = CatalogCache().load(excel_path)
+    texts = [f"{c} - {n}" if c else n for c, n in zip(df[CODE_COL], df[NAME_COL])]
+
+    cf = CategoryFilter()
+    keyword_categories = dict(cf.keyword_categories)
+    if extra_keywords:
+        keyword_categories["🧪 آزمون"] = [f"کلیدواژه{i}" for i in range(extra_keywords)]
+    automaton = KeywordAutomaton(keyword_categories)
+
+    # هر دو روش باید دسته یکسان بدهند
+    for text in texts:
+        matched = automaton.match(text)
+        expected = _linear_scan_category(keyword_categories, text)
+        first = next((c for c in keyword_categories if c in matched), None)
+        assert first == expected, text
+
+    def timed(func):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for text in texts:
+                func(text)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    linear = timed(lambda t: _linear_scan_category(keyword_categories, t))
+    aho = timed(automaton.match)
+    total = sum(len(k) for k in keyword_categories.values())
+    print(f"{len(texts)} خدمت، {total} کلیدواژه")
+    print(f"  پیمایش جداگانه: {linear * 1000:.1f} ms")
+    print(f"  Aho–Corasick:   {aho * 1000:.1f} ms")
+    return linear, aho
+
+
+if __name__ == '__main__':
+    benchmark_keyword_matching()
+    benchmark_keyword_matching(extra_keywords=500)
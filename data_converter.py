@@ -1,55 +1,226 @@
 """
 اسکریپت تبدیل داده‌های ghardash.xlsx به all.xlsx
 برای مهاجرت داده‌ها
+
+ورودی با openpyxl به صورت فقط‌خواندنی و تکه‌تکه خوانده می‌شود، قیمت هر تکه
+یک‌جا با محاسبه برداری PriceCalculator به دست می‌آید و خروجی به صورت جریانی
+(xlsx فقط‌نوشتنی، CSV یا Parquet) نوشته می‌شود تا حافظه محدود بماند.
 """
+import os
+
+import numpy as np
 import pandas as pd
+from openpyxl import Workbook, load_workbook
+
 from calculator import PriceCalculator
 
-def migrate_to_all_excel():
-    """مهاجرت از ghardash به all"""
-    
-    # بارگذاری فایل all
-    df = pd.read_excel('all.xlsx')
-    
-    # تنظیم هدرها
-    df.columns = ['کدملی', 'ویژگی کد', 'شرح کد', 'توضیحات', 'کل', 'حرفه‌ای', 'فنی', 'ارزش پایه بیهوشی']
-    df = df.iloc[2:].reset_index(drop=True)
+# هدرهای فایل all.xlsx
+INPUT_COLUMNS = ['کدملی', 'ویژگی کد', 'شرح کد', 'توضیحات', 'کل', 'حرفه‌ای', 'فنی', 'ارزش پایه بیهوشی']
+
+OUTPUT_COLUMNS = [
+    'کدملی', 'ویژگی کد', 'شرح کد', 'کل', 'حرفه‌ای', 'فنی',
+    'خصوصی آزاد', 'بیمه شده', 'سهم سازمان', 'دولتی', '70 درصد دولتی'
+]
+
+# ردیف اول هدر اکسل و دو ردیف بعدی عنوان هستند
+FIRST_DATA_ROW = 4
+CHUNK_SIZE = 20000
+
+
+def read_catalog_chunks(input_path, chunk_size=CHUNK_SIZE):
+    """خواندن تکه‌تکه ردیف‌های all.xlsx (هر تکه یک DataFrame با INPUT_COLUMNS)"""
+    wb = load_workbook(input_path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        width = len(INPUT_COLUMNS)
+        rows = []
+        for values in ws.iter_rows(min_row=FIRST_DATA_ROW, values_only=True):
+            values = tuple(values[:width])
+            if len(values) < width:
+                values += (None,) * (width - len(values))
+            rows.append(values)
+            if len(rows) >= chunk_size:
+                yield pd.DataFrame(rows, columns=INPUT_COLUMNS)
+                rows = []
+        if rows:
+            yield pd.DataFrame(rows, columns=INPUT_COLUMNS)
+    finally:
+        wb.close()
+
+
+def calculate_chunk(df, calculator):
+    """محاسبه برداری قیمت یک تکه از کاتالوگ (همان خروجی محاسبه ردیف به ردیف)"""
     df = df.dropna(subset=['کدملی'])
-    
+
+    # متن غیرعددی صفر حساب می‌شود (در all.xlsx: توضیح متنی کد 301225 و '\xa00' فنی کدهای 901715 و 901740)
+    professional = pd.to_numeric(df['حرفه‌ای'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    technical = pd.to_numeric(df['فنی'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+    # فقط خدماتی که ضریب حرفه‌ای یا فنی دارند
+    mask = (professional > 0) | (technical > 0)
+    df = df[mask]
+    professional = professional[mask]
+    technical = technical[mask]
+
+    service_types = df['ویژگی کد'].where(df['ویژگی کد'].notna(), '').astype(str)
+    prices = calculator.calculate_prices_batch(
+        professional, technical, PriceCalculator.hash_mask(service_types)
+    )
+
+    return pd.DataFrame({
+        'کدملی': df['کدملی'].astype(str).str.strip().to_numpy(),
+        'ویژگی کد': service_types.to_numpy(),
+        'شرح کد': df['شرح کد'].to_numpy(),
+        'کل': df['کل'].to_numpy(),
+        'حرفه‌ای': professional,
+        'فنی': technical,
+        'خصوصی آزاد': prices['private'],
+        'بیمه شده': prices['insurance'],
+        'سهم سازمان': prices['organization'],
+        'دولتی': prices['government'],
+        '70 درصد دولتی': prices['government_70'],
+    }, columns=OUTPUT_COLUMNS)
+
+
+class XlsxChunkWriter:
+    """نوشتن جریانی xlsx (openpyxl فقط‌نوشتنی - ردیف‌ها در حافظه نگه داشته نمی‌شوند)"""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet()
+        self.ws.append(OUTPUT_COLUMNS)
+
+    def write(self, chunk):
+        columns = [chunk[col].tolist() for col in OUTPUT_COLUMNS]
+        for row in zip(*columns):
+            self.ws.append(row)
+
+    def close(self):
+        self.wb.save(self.output_path)
+
+
+class CsvChunkWriter:
+    """نوشتن تکه‌تکه CSV (utf-8-sig تا اکسل فارسی را درست نشان دهد)"""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.header = True
+
+    def write(self, chunk):
+        chunk.to_csv(
+            self.output_path, index=False, header=self.header,
+            mode='w' if self.header else 'a',
+            encoding='utf-8-sig' if self.header else 'utf-8'
+        )
+        self.header = False
+
+    def close(self):
+        if self.header:
+            pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(self.output_path, index=False, encoding='utf-8-sig')
+
+
+class ParquetChunkWriter:
+    """نوشتن تکه‌تکه Parquet (نیاز به pyarrow)"""
+
+    def __init__(self, output_path):
+        import pyarrow  # noqa: F401 - پیام خطای روشن اگر نصب نباشد
+        self.output_path = output_path
+        self.writer = None
+
+    def write(self, chunk):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # ستون‌های متنی/مخلوط اکسل به رشته تبدیل می‌شوند تا schema همه تکه‌ها یکی باشد
+        chunk = chunk.copy()
+        for col in ('کدملی', 'ویژگی کد', 'شرح کد', 'کل'):
+            chunk[col] = chunk[col].where(chunk[col].notna(), None).astype(object).map(
+                lambda v: None if v is None else str(v)
+            )
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.output_path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+OUTPUT_WRITERS = {
+    '.xlsx': XlsxChunkWriter,
+    '.csv': CsvChunkWriter,
+    '.parquet': ParquetChunkWriter,
+}
+
+
+def migrate_to_all_excel(input_path='all.xlsx', output_path='calculated_prices.xlsx',
+                         coefficients=None, chunk_size=CHUNK_SIZE):
+    """
+    مهاجرت از ghardash به all
+
+    Args:
+        input_path: فایل all.xlsx
+        output_path: فایل خروجی (.xlsx، .csv یا .parquet)
+        coefficients: ضرایب کای (پیشفرض: coefficients.json)
+        chunk_size: تعداد ردیف هر تکه
+
+    Returns:
+        int: تعداد خدمات محاسبه‌شده
+    """
+    ext = os.path.splitext(output_path)[1].lower()
+    if ext not in OUTPUT_WRITERS:
+        raise ValueError(f"فرمت خروجی پشتیبانی نمی‌شود: {ext}")
+
     # بارگذاری ضرایب
-    coefficients = PriceCalculator.load_coefficients_from_file()
+    if coefficients is None:
+        coefficients = PriceCalculator.load_coefficients_from_file()
     calculator = PriceCalculator(coefficients)
-    
-    # محاسبه قیمت‌ها برای هر خدمت
-    prices_data = []
-    
-    for idx, row in df.iterrows():
-        code = str(row['کدملی']).strip()
-        service_type = str(row['ویژگی کد']) if pd.notna(row['ویژگی کد']) else ''
-        professional = float(row['حرفه‌ای']) if pd.notna(row['حرفه‌ای']) else 0
-        technical = float(row['فنی']) if pd.notna(row['فنی']) else 0
-        
-        if professional > 0 or technical > 0:
-            prices = calculator.calculate_service_price(service_type, professional, technical)
-            
-            prices_data.append({
-                'کدملی': code,
-                'ویژگی کد': service_type,
-                'شرح کد': row['شرح کد'],
-                'کل': row['کل'],
-                'حرفه‌ای': professional,
-                'فنی': technical,
-                'خصوصی آزاد': prices['private'],
-                'بیمه شده': prices['insurance'],
-                'سهم سازمان': prices['organization'],
-                'دولتی': prices['government'],
-                '70 درصد دولتی': prices['government_70']
-            })
-    
-    # ذخیره در فایل جدید
-    output_df = pd.DataFrame(prices_data)
-    output_df.to_excel('calculated_prices.xlsx', index=False)
-    print(f"محاسبات برای {len(prices_data)} خدمت انجام شد و در calculated_prices.xlsx ذخیره گردید")
+
+    writer = OUTPUT_WRITERS[ext](output_path)
+    count = 0
+    for chunk in read_catalog_chunks(input_path, chunk_size):
+        result = calculate_chunk(chunk, calculator)
+        if len(result):
+            writer.write(result)
+            count += len(result)
+    writer.close()
+
+    print(f"محاسبات برای {count} خدمت انجام شد و در {output_path} ذخیره گردید")
+    return count
+
+
+def benchmark_migration(rows=100000, work_dir='.'):
+    """زمان مهاجرت یک کاتالوگ ساختگی بزرگ (ساخته‌شده از تکرار ردیف‌های all.xlsx)"""
+    import time
+
+    sample = next(read_catalog_chunks('all.xlsx'))
+    big_path = os.path.join(work_dir, 'benchmark_all.xlsx')
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(INPUT_COLUMNS)
+    ws.append([None] * len(INPUT_COLUMNS))
+    ws.append([None] * len(INPUT_COLUMNS))
+    values = sample.astype(object).where(sample.notna(), None).values.tolist()
+    for i in range(rows):
+        ws.append(values[i % len(values)])
+    wb.save(big_path)
+
+    try:
+        for ext in ('.xlsx', '.csv'):
+            out_path = os.path.join(work_dir, f'benchmark_prices{ext}')
+            start = time.perf_counter()
+            migrate_to_all_excel(big_path, out_path)
+            print(f"  {rows} ردیف -> {ext}: {time.perf_counter() - start:.2f} s")
+            os.remove(out_path)
+    finally:
+        os.remove(big_path)
+
 
 if __name__ == '__main__':
-    migrate_to_all_excel()
+    import sys
+    if '--benchmark' in sys.argv:
+        benchmark_migration()
+    else:
+        migrate_to_all_excel()
@@ -7,6 +7,8 @@ import shutil
 from datetime import datetime
 from PyQt6.QtWidgets import QMessageBox
 
+from utils import link_or_write
+
 
 class FeatureManager:
     """مدیریت قابلیت‌های اضافی"""
@@ -37,11 +39,20 @@ class FeatureManager:
             )
             return False
     
-    def save_to_history(self, pdf_path, patient_name):
-        """ذخیره فاکتور در تاریخچه"""
+    def save_to_history(self, pdf_path, patient_name, data=None):
+        """
+        ذخیره فاکتور در تاریخچه
+
+        Args:
+            data: محتوای PDF - تاریخچه hardlink به pdf_path است و فقط اگر
+                سیستم فایل اجازه ندهد data (بدون خواندن دوباره فایل) نوشته می‌شود
+        """
         try:
             history_name = f"invoices_history/{patient_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            shutil.copy2(pdf_path, history_name)
+            if data is None:
+                shutil.copy2(pdf_path, history_name)
+            else:
+                link_or_write(pdf_path, history_name, data)
             return True
         except Exception as e:
             print(f"خطا در ذخیره تاریخچه: {e}")
@@ -5,10 +5,13 @@ from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.platypus import Table, TableStyle
 from reportlab.lib import colors
 from reportlab.lib.units import mm
+from dataclasses import dataclass
 from datetime import datetime
-import jdatetime, os, platform, subprocess, shutil, json
+import jdatetime, io, os, platform, subprocess, json
 from textwrap import wrap
 
+from utils import int_from_string, shape_text, shape_cache_stats, write_bytes_exclusive
+
 # پشتیبانی از فارسی
 try:
     import arabic_reshaper
@@ -27,179 +30,301 @@ except:
     print("⚠️ فونت Vazirmatn یافت نشد!")
 
 def persian_text(txt):
-    """تبدیل متن فارسی برای نمایش صحیح"""
+    """تبدیل متن فارسی برای نمایش صحیح (از کش مشترک شکل‌دهی utils)"""
     if ARABIC_SUPPORT:
-        return get_display(arabic_reshaper.reshape(str(txt)))
+        return shape_text(str(txt))
     return str(txt)
 
+
+# برچسب‌های ثابت قالب فاکتور - یک بار هنگام import شکل داده می‌شوند
+LABELS = {
+    text: persian_text(text)
+    for text in ("مبلغ (ریال)", "نوع تعرفه", "شرح خدمت", "ردیف", "تخفیف", "-", "جمع کل",
+                 "با آرزوی سلامتی 🌿")
+}
+
 def wrap_text(text, limit=32):
     """شکستن متن طولانی شرح خدمت"""
     lines = wrap(str(text), limit)
     return "\n".join(lines)
 
-def generate_invoice(app):
-    """تولید فاکتور رسمی با ذخیره خودکار"""
-    try:
-        # ---------- اطلاعات بیمار ----------
-        patient = app.name_in.text().strip()
-        national = app.national_code_in.text().strip()
-        tracking = app.tracking_code_in.text().strip()
-        insurance = app.ins_in.text().strip()
-        today = jdatetime.date.today().strftime("%Y/%m/%d")
-        
-        # نام فایل موقت
-        filename = f"invoice_temp_{datetime.now().strftime('%H%M%S')}.pdf"
-        c = canvas.Canvas(filename, pagesize=A6)
-        w, h = A6
-        font, bold = ("Vazir", "Vazir-Bold") if HAS_FONT else ("Helvetica", "Helvetica-Bold")
-        margin = 8 * mm
-        
-        # ---------- سربرگ ----------
-        logo_w, logo_h = 24 * mm, 24 * mm
-        top_y = h - 6 * mm
-        
-        # لوگو در وسط یکسوم چپ
-        if hasattr(app, "logo_path") and app.logo_path and os.path.exists(app.logo_path):
-            try:
-                left_third = w / 3
-                logo_x = (left_third - logo_w) / 2
-                logo_y = top_y - (logo_h / 2) - 10 * mm
-                c.drawImage(app.logo_path, logo_x, logo_y, logo_w, logo_h, preserveAspectRatio=True, mask='auto')
-            except:
-                pass
-        
-        # اطلاعات مرکز سمت راست
-        text_right = w - margin
-        c.setFont(bold, 12)
-        c.setFillColor(colors.HexColor("#003366"))
-        c.drawRightString(text_right, top_y - 5 * mm, persian_text(app.company_name))
-        c.setFont(font, 7)
-        c.setFillColor(colors.black)
-        c.drawRightString(text_right, top_y - 11 * mm, persian_text(app.address))
-        c.drawRightString(text_right, top_y - 16 * mm, persian_text(f"تلفن: {app.phone}"))
-        
-        y = top_y - 22 * mm
-        c.line(margin, y, w - margin, y)
-        y -= 4 * mm
-        
-        # ---------- مشخصات بیمار ----------
-        c.setFont(font, 8)
-        info = [
-            f"نام بیمار: {patient or '-'}",
-            f"کد ملی: {national or '-'}",
-            f"کد پیگیری: {tracking or '-'}",
-            f"بیمه: {insurance or '-'}",
-            f"تاریخ: {today}"
-        ]
-        
-        for line in info:
-            c.drawRightString(w - 10 * mm, y, persian_text(line))
-            y -= 5 * mm
-        
-        c.line(margin, y, w - margin, y)
-        y -= 10 * mm
-        
-        # ---------- جدول خدمات ----------
-        data = [[persian_text("مبلغ (ریال)"), persian_text("نوع تعرفه"),
-                 persian_text("شرح خدمت"), persian_text("ردیف")]]
-        
-        total = 0
-        for i in range(app.table.rowCount()):
-            idx = str(i + 1)
-            service = wrap_text(app.table.item(i, 0).text(), 32)
-            tariff = app.table.item(i, 1).text()
-            cost = app.table.item(i, 4).text().replace(",", "")
-            try:
-                val = int(cost)
-            except:
-                val = 0
-            total += val
-            data.append([
-                persian_text(f"{val:,}"),
-                persian_text(tariff),
-                persian_text(service),
-                persian_text(idx)
-            ])
-        
-        disc_val = app.discount_spin.value()
-        if disc_val > 0:
-            disc_type = app.discount_type.currentText()
-            data.append([
-                persian_text(f"-{disc_val:,}"),
-                persian_text(disc_type),
-                persian_text("تخفیف"),
-                persian_text("-")
-            ])
-        
+
+@dataclass(frozen=True)
+class InvoiceArtifact:
+    """
+    فاکتور تولیدشده (غیرقابل تغییر) - یک بار ساخته می‌شود و ذخیره، تاریخچه،
+    سوابق بیمار و چاپ همه از همین نتیجه استفاده می‌کنند
+    """
+    path: str    # مسیر فایل ذخیره‌شده
+    data: bytes  # محتوای PDF
+
+
+@dataclass(frozen=True)
+class InvoiceLine:
+    """یک ردیف خدمت فاکتور"""
+    service: str
+    tariff: str
+    cost: int          # مبلغ کل
+    organization: int  # سهم سازمان
+    patient_pay: int   # سهم بیمار (مبلغ چاپ‌شده در فاکتور)
+
+
+@dataclass(frozen=True)
+class Invoice:
+    """
+    داده‌های فاکتور بدون وابستگی به ویجت‌ها - یک بار از رابط کاربری ساخته می‌شود و
+    رندر آن در هر thread (یا به صورت دسته‌ای) قابل انجام است
+    """
+    patient_name: str
+    national_code: str
+    tracking_code: str
+    insurance: str
+    date: str                  # تاریخ شمسی YYYY/MM/DD
+    lines: tuple = ()          # InvoiceLine ها
+    discount_value: int = 0
+    discount_type: str = "ریالی"
+    tariff_type: str = ""
+    company_name: str = ""
+    address: str = ""
+    phone: str = ""
+    logo_path: str = ""
+
+    @property
+    def subtotal(self):
+        """جمع مبلغ کل خدمات (قبل از تخفیف)"""
+        return sum(line.cost for line in self.lines)
+
+    @property
+    def discount_amount(self):
+        """مبلغ تخفیف به ریال"""
+        if self.discount_value <= 0:
+            return 0
+        if self.discount_type == "درصدی":
+            return int(self.subtotal * self.discount_value / 100)
+        return self.discount_value
+
+    @property
+    def total(self):
+        """جمع کل بعد از تخفیف"""
+        return max(0, self.subtotal - self.discount_amount)
+
+    @property
+    def organization(self):
+        """جمع سهم سازمان"""
+        return sum(line.organization for line in self.lines)
+
+    @property
+    def patient_pay(self):
+        """سهم بیمار بعد از تخفیف"""
+        return max(0, sum(line.patient_pay for line in self.lines) - self.discount_amount)
+
+
+def invoice_from_app(app):
+    """ساخت Invoice از ویجت‌های پنجره اصلی (فقط در thread رابط کاربری)"""
+    lines = []
+    for i in range(app.table.rowCount()):
+        lines.append(InvoiceLine(
+            service=app.table.item(i, 0).text(),
+            tariff=app.table.item(i, 1).text(),
+            cost=int_from_string(app.table.item(i, 2).text()),
+            organization=int_from_string(app.table.item(i, 3).text()),
+            patient_pay=int_from_string(app.table.item(i, 4).text()),
+        ))
+
+    logo_path = getattr(app, "logo_path", "") or ""
+    return Invoice(
+        patient_name=app.name_in.text().strip(),
+        national_code=app.national_code_in.text().strip(),
+        tracking_code=app.tracking_code_in.text().strip(),
+        insurance=app.ins_in.text().strip(),
+        date=jdatetime.date.today().strftime("%Y/%m/%d"),
+        lines=tuple(lines),
+        discount_value=app.discount_spin.value(),
+        discount_type=app.discount_type.currentText(),
+        tariff_type=app.type_combo.currentText(),
+        company_name=app.company_name,
+        address=app.address,
+        phone=app.phone,
+        logo_path=logo_path,
+    )
+
+
+def render_invoice(invoice, target):
+    """
+    رسم PDF فاکتور (بدون دسترسی به ویجت‌ها - قابل اجرا در هر thread)
+
+    Args:
+        invoice: Invoice
+        target: مسیر فایل یا شیء فایل (مثلاً io.BytesIO)
+    """
+    c = canvas.Canvas(target, pagesize=A6)
+    w, h = A6
+    font, bold = ("Vazir", "Vazir-Bold") if HAS_FONT else ("Helvetica", "Helvetica-Bold")
+    margin = 8 * mm
+    
+    # ---------- سربرگ ----------
+    logo_w, logo_h = 24 * mm, 24 * mm
+    top_y = h - 6 * mm
+    
+    # لوگو در وسط یکسوم چپ
+    if invoice.logo_path and os.path.exists(invoice.logo_path):
+        try:
+            left_third = w / 3
+            logo_x = (left_third - logo_w) / 2
+            logo_y = top_y - (logo_h / 2) - 10 * mm
+            c.drawImage(invoice.logo_path, logo_x, logo_y, logo_w, logo_h, preserveAspectRatio=True, mask='auto')
+        except:
+            pass
+    
+    # اطلاعات مرکز سمت راست
+    text_right = w - margin
+    c.setFont(bold, 12)
+    c.setFillColor(colors.HexColor("#003366"))
+    c.drawRightString(text_right, top_y - 5 * mm, persian_text(invoice.company_name))
+    c.setFont(font, 7)
+    c.setFillColor(colors.black)
+    c.drawRightString(text_right, top_y - 11 * mm, persian_text(invoice.address))
+    c.drawRightString(text_right, top_y - 16 * mm, persian_text(f"تلفن: {invoice.phone}"))
+    
+    y = top_y - 22 * mm
+    c.line(margin, y, w - margin, y)
+    y -= 4 * mm
+    
+    # ---------- مشخصات بیمار ----------
+    c.setFont(font, 8)
+    info = [
+        f"نام بیمار: {invoice.patient_name or '-'}",
+        f"کد ملی: {invoice.national_code or '-'}",
+        f"کد پیگیری: {invoice.tracking_code or '-'}",
+        f"بیمه: {invoice.insurance or '-'}",
+        f"تاریخ: {invoice.date}"
+    ]
+    
+    for line in info:
+        c.drawRightString(w - 10 * mm, y, persian_text(line))
+        y -= 5 * mm
+    
+    c.line(margin, y, w - margin, y)
+    y -= 10 * mm
+    
+    # ---------- جدول خدمات ----------
+    data = [[LABELS["مبلغ (ریال)"], LABELS["نوع تعرفه"],
+             LABELS["شرح خدمت"], LABELS["ردیف"]]]
+    
+    total = 0
+    for i, line in enumerate(invoice.lines):
+        val = line.patient_pay
+        total += val
         data.append([
-            persian_text(f"{total:,}"),
-            "",
-            persian_text("جمع کل"),
-            ""
+            persian_text(f"{val:,}"),
+            persian_text(line.tariff),
+            persian_text(wrap_text(line.service, 32)),
+            persian_text(str(i + 1))
         ])
-        
-        # ---------- ساخت جدول ----------
-        table = Table(data, colWidths=[22 * mm, 22 * mm, 39 * mm, 10 * mm])
-        table.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#002b5c")),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-            ("TEXTCOLOR", (0, 1), (-1, -1), colors.black),
-            ("ALIGN", (0, 0), (-1, -1), "RIGHT"),
-            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-            ("FONTNAME", (0, 0), (-1, 0), bold),
-            ("FONTNAME", (0, 1), (-1, -1), font),
-            ("FONTSIZE", (0, 0), (-1, -1), 8),
-            ("LEADING", (0, 0), (-1, -1), 10),
-            ("GRID", (0, 0), (-1, -1), 0.6, colors.HexColor("#004c7d")),
-            ("BOX", (0, 0), (-1, -1), 1.2, colors.HexColor("#002b5c")),
-            ("ROWBACKGROUNDS", (0, 1), (-1, -2),
-             [colors.HexColor("#f9fbfd"), colors.HexColor("#eef3f9")]),
-            ("BACKGROUND", (0, -1), (-1, -1), colors.HexColor("#e8f4f8")),
-        ]))
-        
-        table.wrapOn(c, w, h)
-        table_width = sum([22 * mm, 22 * mm, 39 * mm, 10 * mm])
-        x_start = w - table_width - 6 * mm
-        tbl_height = len(data) * 6.3 * mm
-        table.drawOn(c, x_start, y - tbl_height)
-        y -= tbl_height + 12 * mm
-        
-        # ---------- پایانی ----------
-        c.setFont(bold, 8)
-        c.drawCentredString(w / 2, 10 * mm, persian_text("با آرزوی سلامتی 🌿"))
-        c.save()
+    
+    if invoice.discount_value > 0:
+        data.append([
+            persian_text(f"-{invoice.discount_value:,}"),
+            persian_text(invoice.discount_type),
+            LABELS["تخفیف"],
+            LABELS["-"]
+        ])
+    
+    data.append([
+        persian_text(f"{total:,}"),
+        "",
+        LABELS["جمع کل"],
+        ""
+    ])
+    
+    # ---------- ساخت جدول ----------
+    table = Table(data, colWidths=[22 * mm, 22 * mm, 39 * mm, 10 * mm])
+    table.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#002b5c")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("TEXTCOLOR", (0, 1), (-1, -1), colors.black),
+        ("ALIGN", (0, 0), (-1, -1), "RIGHT"),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("FONTNAME", (0, 0), (-1, 0), bold),
+        ("FONTNAME", (0, 1), (-1, -1), font),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("LEADING", (0, 0), (-1, -1), 10),
+        ("GRID", (0, 0), (-1, -1), 0.6, colors.HexColor("#004c7d")),
+        ("BOX", (0, 0), (-1, -1), 1.2, colors.HexColor("#002b5c")),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -2),
+         [colors.HexColor("#f9fbfd"), colors.HexColor("#eef3f9")]),
+        ("BACKGROUND", (0, -1), (-1, -1), colors.HexColor("#e8f4f8")),
+    ]))
+    
+    table.wrapOn(c, w, h)
+    table_width = sum([22 * mm, 22 * mm, 39 * mm, 10 * mm])
+    x_start = w - table_width - 6 * mm
+    tbl_height = len(data) * 6.3 * mm
+    table.drawOn(c, x_start, y - tbl_height)
+    y -= tbl_height + 12 * mm
+    
+    # ---------- پایانی ----------
+    c.setFont(bold, 8)
+    c.drawCentredString(w / 2, 10 * mm, LABELS["با آرزوی سلامتی 🌿"])
+    c.save()
+
+
+def invoice_save_dir(app):
+    """پوشه ذخیره فاکتورها (تنظیم برنامه یا پوشه جاری)"""
+    try:
+        if hasattr(app, "save_dir") and os.path.exists(app.save_dir):
+            return app.save_dir
+        if os.path.exists("app_settings.json"):
+            with open("app_settings.json", "r", encoding="utf-8") as f:
+                settings = json.load(f)
+                return settings.get("save_path", os.getcwd())
+    except Exception as e:
+        print(f"⚠️ خطا در خواندن پوشه ذخیره فاکتور: {e}")
+    return os.getcwd()
+
+
+def invoice_file_names(invoice):
+    """نام‌های پیشنهادی فایل فاکتور به ترتیب (نام ساده، با ساعت، با ساعت و شماره)"""
+    date_tag = invoice.date.replace("/", "-")
+    clean_code = invoice.national_code if invoice.national_code else "بدون-کد"
+    yield f"فاکتور_{clean_code}_{date_tag}.pdf"
+    timestamp = datetime.now().strftime("%H%M%S")
+    yield f"فاکتور_{clean_code}_{date_tag}_{timestamp}.pdf"
+    counter = 2
+    while True:
+        yield f"فاکتور_{clean_code}_{date_tag}_{timestamp}_{counter}.pdf"
+        counter += 1
+
+
+def save_invoice_pdf(invoice, save_path):
+    """
+    رندر و ذخیره فاکتور در پوشه save_path (بدون ویجت - قابل اجرا در هر thread)
+
+    Returns:
+        InvoiceArtifact یا None در صورت خطا
+    """
+    try:
+        # رندر در حافظه - هر مقصد فقط یک بار (و اتمیک) نوشته می‌شود
+        buffer = io.BytesIO()
+        render_invoice(invoice, buffer)
+        data = buffer.getvalue()
         
         # ---------- ذخیره خودکار ----------
-        final_path = filename
+        # اگر فایل وجود داشت، timestamp (و در صورت نیاز شماره) اضافه می‌شود - بدون بازنویسی
         try:
-            if hasattr(app, "save_dir") and os.path.exists(app.save_dir):
-                save_path = app.save_dir
-            elif os.path.exists("app_settings.json"):
-                with open("app_settings.json", "r", encoding="utf-8") as f:
-                    settings = json.load(f)
-                    save_path = settings.get("save_path", os.getcwd())
-            else:
-                save_path = os.getcwd()
-            
             os.makedirs(save_path, exist_ok=True)
-            date_tag = jdatetime.date.today().strftime("%Y-%m-%d")
-            clean_code = national if national else "بدون-کد"
-            final_name = f"فاکتور_{clean_code}_{date_tag}.pdf"
-            final_path = os.path.join(save_path, final_name)
-            
-            # اگر فایل وجود داشت، timestamp اضافه کن
-            if os.path.exists(final_path):
-                timestamp = datetime.now().strftime("%H%M%S")
-                final_name = f"فاکتور_{clean_code}_{date_tag}_{timestamp}.pdf"
-                final_path = os.path.join(save_path, final_name)
-            
-            shutil.move(filename, final_path)
+            final_path = write_bytes_exclusive(
+                (os.path.join(save_path, name) for name in invoice_file_names(invoice)), data
+            )
             print(f"✅ فاکتور در پوشه ذخیره شد:\n{final_path}")
         except Exception as e:
+            # پوشه ذخیره در دسترس نیست - ذخیره در پوشه جاری
             print(f"⚠️ خطا در ذخیره خودکار فاکتور: {e}")
-            final_path = filename
+            final_path = write_bytes_exclusive(
+                (os.path.abspath(name) for name in invoice_file_names(invoice)), data
+            )
         
-        return final_path
+        return InvoiceArtifact(final_path, data)
     
     except Exception as e:
         print(f"⚠️ خطا در اجرای فاکتور: {e}")
@@ -208,20 +333,46 @@ def generate_invoice(app):
         return None
 
 
-def direct_print(app):
-    """چاپ حرفه‌ای با استفاده از QPrintDialog و PyMuPDF - سازگار کامل با PyQt6"""
+def generate_invoice(app, invoice=None):
+    """
+    تولید فاکتور رسمی با ذخیره خودکار
+
+    Args:
+        invoice: Invoice ساخته‌شده (اگر نباشد از ویجت‌های app ساخته می‌شود)
+
+    Returns:
+        InvoiceArtifact یا None در صورت خطا
+    """
+    try:
+        if invoice is None:
+            invoice = invoice_from_app(app)
+    except Exception as e:
+        print(f"⚠️ خطا در اجرای فاکتور: {e}")
+        return None
+    return save_invoice_pdf(invoice, invoice_save_dir(app))
+
+
+def direct_print(app, artifact=None):
+    """
+    چاپ حرفه‌ای با استفاده از QPrintDialog و PyMuPDF - سازگار کامل با PyQt6
+
+    Args:
+        artifact: فاکتور تولیدشده (InvoiceArtifact)؛ اگر نباشد فاکتور ساخته می‌شود
+    """
     from PyQt6.QtWidgets import QMessageBox
     from PyQt6.QtPrintSupport import QPrinter, QPrintDialog
     from PyQt6.QtGui import QPainter, QImage, QPageSize, QPageLayout
     from PyQt6.QtCore import QRectF
     
     try:
-        # تولید فاکتور
-        pdf_path = generate_invoice(app)
+        # فاکتور فقط اگر قبلاً ساخته نشده باشد تولید می‌شود
+        if artifact is None:
+            artifact = generate_invoice(app)
         
-        if not pdf_path or not os.path.exists(pdf_path):
+        if artifact is None or not artifact.data:
             QMessageBox.warning(app, "خطا", "⚠️ فایل PDF برای چاپ یافت نشد!")
             return
+        pdf_path = artifact.path
         
         # بررسی وجود PyMuPDF
         try:
@@ -246,7 +397,8 @@ def direct_print(app):
             
             if print_dialog.exec() == QPrintDialog.DialogCode.Accepted:
                 try:
-                    doc = fitz.open(pdf_path)
+                    # چاپ از محتوای حافظه (بدون خواندن دوباره فایل)
+                    doc = fitz.open(stream=artifact.data, filetype="pdf")
                     painter = QPainter()
                     
                     if not painter.begin(printer):
@@ -373,3 +525,61 @@ def fallback_print(app, pdf_path):
             f"لطفاً دستی آن را باز و چاپ کنید."
         )
         print(f"⚠️ خطا در باز کردن فایل: {e}")
+
+
+def benchmark_render(count=50, lines=12):
+    """
+    زمان رندر دسته‌ای فاکتورها در حافظه (بدون رابط کاربری) - با و بدون کش شکل‌دهی متن
+
+    در اجرای بدون کش برچسب‌های ثابت (LABELS) هم در هر رندر دوباره شکل داده می‌شوند،
+    یعنی همان کاری که قبل از کش انجام می‌شد.
+    """
+    import time
+    global shape_text, LABELS
+
+    class ShapedLabels:
+        """برچسب‌ها بدون شکل‌دهی قبلی - در هر دسترسی شکل داده می‌شوند"""
+        def __getitem__(self, text):
+            return persian_text(text)
+
+    invoice = Invoice(
+        patient_name="علی احمدی", national_code="0012345678", tracking_code="123456",
+        insurance="تامین اجتماعی", date=jdatetime.date.today().strftime("%Y/%m/%d"),
+        lines=tuple(
+            InvoiceLine(f"خدمت شماره {i % 4} - سونوگرافی کامل شکم و لگن", "بیمه‌شده",
+                        1500000 + i, 1050000, 450000 + i % 3)
+            for i in range(lines)
+        ),
+        discount_value=50000, company_name="درمانگاه نمونه", address="تهران", phone="021-00000000",
+    )
+
+    def timed():
+        start = time.perf_counter()
+        size = 0
+        for _ in range(count):
+            buffer = io.BytesIO()
+            render_invoice(invoice, buffer)
+            size += len(buffer.getvalue())
+        return (time.perf_counter() - start) / count, size // count
+
+    render_invoice(invoice, io.BytesIO())  # بارگذاری فونت‌ها قبل از اندازه‌گیری
+    cached, labels = shape_text, LABELS
+    shape_text = cached.__wrapped__  # همان تابع بدون lru_cache
+    LABELS = ShapedLabels()
+    try:
+        uncached_time, size = timed()
+    finally:
+        shape_text, LABELS = cached, labels
+    cached.cache_clear()
+    cached_time, _ = timed()
+    stats = shape_cache_stats()
+
+    print(f"{count} فاکتور ({lines} ردیف، میانگین {size:,} بایت):")
+    print(f"  بدون کش (برچسب‌ها هم در هر رندر): {uncached_time * 1000:.1f} ms برای هر فاکتور")
+    print(f"  با کش:   {cached_time * 1000:.1f} ms برای هر فاکتور "
+          f"(hit rate {stats['hit_rate']:.0%}، {stats['size']} متن در کش)")
+    return uncached_time, cached_time
+
+
+if __name__ == '__main__':
+    benchmark_render()
@@ -0,0 +1,134 @@
+"""
+سرویس ذخیره فاکتور در پس‌زمینه
+رندر PDF، انتقال فایل، ثبت سوابق بیمار و کپی تاریخچه در QThreadPool انجام می‌شود؛
+رابط کاربری فقط داده فاکتور (Invoice) را می‌سازد و بلافاصله آزاد است.
+"""
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from invoice import save_invoice_pdf
+
+
+def patient_record_from_invoice(invoice, pdf_path):
+    """داده ثبت سوابق بیمار از روی فاکتور"""
+    return {
+        'name': invoice.patient_name,
+        'insurance': invoice.insurance,
+        'tracking_code': invoice.tracking_code,
+        'services': [
+            {'name': line.service, 'tariff': line.tariff, 'cost': line.cost}
+            for line in invoice.lines
+        ],
+        'total': invoice.total,
+        'organization': invoice.organization,
+        'patient_pay': invoice.patient_pay,
+        'discount': invoice.discount_amount,
+        'tariff_type': invoice.tariff_type,
+        'pdf_path': pdf_path
+    }
+
+
+def history_name(invoice):
+    """نام فایل تاریخچه: نام بیمار_کدملی_کدپیگیری"""
+    parts = [invoice.patient_name or "بیمار"]
+    if invoice.national_code:
+        parts.append(invoice.national_code)
+    if invoice.tracking_code:
+        parts.append(invoice.tracking_code)
+    return "_".join(parts)
+
+
+class InvoiceSaveSignals(QObject):
+    """سیگنال‌های یک کار ذخیره (QRunnable خودش سیگنال ندارد)"""
+    saved = pyqtSignal(int, object)    # شماره کار، InvoiceArtifact
+    failed = pyqtSignal(int, str)      # شماره کار، پیام خطا
+
+
+class InvoiceSaveTask(QRunnable):
+    """ذخیره کامل یک فاکتور: PDF + سوابق بیمار + تاریخچه"""
+
+    def __init__(self, ticket, invoice, save_dir, patient_records=None, features=None):
+        super().__init__()
+        self.ticket = ticket
+        self.invoice = invoice
+        self.save_dir = save_dir
+        self.patient_records = patient_records
+        self.features = features
+        self.signals = InvoiceSaveSignals()
+
+    def run(self):
+        try:
+            artifact = save_invoice_pdf(self.invoice, self.save_dir)
+            if artifact is None:
+                self.signals.failed.emit(self.ticket, "خطا در ساخت فایل PDF فاکتور")
+                return
+
+            national_code = self.invoice.national_code
+            if national_code and self.patient_records:
+                data = patient_record_from_invoice(self.invoice, artifact.path)
+                if self.patient_records.add_record(national_code, data):
+                    print(f"✅ سوابق بیمار {national_code} ذخیره شد")
+
+            if self.features:
+                self.features.save_to_history(artifact.path, history_name(self.invoice), artifact.data)
+
+            self.signals.saved.emit(self.ticket, artifact)
+        except Exception as e:
+            self.signals.failed.emit(self.ticket, str(e))
+
+
+class InvoiceSaveService(QObject):
+    """صف ذخیره فاکتورها - یک thread تا فایل‌ها به ترتیب ثبت نوشته شوند"""
+    saved = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+    pending_changed = pyqtSignal(int)  # تعداد فاکتورهای در صف
+
+    def __init__(self, patient_records=None, features=None, parent=None):
+        super().__init__(parent)
+        self.patient_records = patient_records
+        self.features = features
+        self.pool = QThreadPool(self)
+        # فاکتورها به ترتیب ثبت ذخیره می‌شوند (ترتیب نام فایل‌ها، سوابق و تاریخچه)
+        self.pool.setMaxThreadCount(1)
+        self.next_ticket = 0
+        self.tasks = {}  # شماره کار -> کار در حال اجرا (نگه داشتن سیگنال‌ها تا پایان)
+
+    def submit(self, invoice, save_dir):
+        """
+        افزودن فاکتور به صف ذخیره
+
+        Returns:
+            int: شماره کار (در سیگنال‌های saved/failed برمی‌گردد)
+        """
+        self.next_ticket += 1
+        task = InvoiceSaveTask(self.next_ticket, invoice, save_dir, self.patient_records, self.features)
+        # سیگنال‌ها فرزند سرویس (در thread رابط کاربری) - بعد از پایان با deleteLater حذف می‌شوند
+        task.signals.setParent(self)
+        task.signals.saved.connect(self._on_saved)
+        task.signals.failed.connect(self._on_failed)
+        self.tasks[task.ticket] = task
+        self.pool.start(task)
+        self.pending_changed.emit(len(self.tasks))
+        return task.ticket
+
+    def pending(self):
+        """تعداد فاکتورهای ذخیره‌نشده"""
+        return len(self.tasks)
+
+    def wait(self):
+        """منتظر ماندن برای ذخیره همه فاکتورهای صف (هنگام بستن برنامه)"""
+        self.pool.waitForDone()
+
+    def _finish(self, ticket):
+        task = self.tasks.pop(ticket, None)
+        if task is not None:
+            task.signals.deleteLater()
+        self.pending_changed.emit(len(self.tasks))
+
+    def _on_saved(self, ticket, artifact):
+        self._finish(ticket)
+        self.saved.emit(ticket, artifact)
+
+    def _on_failed(self, ticket, message):
+        self._finish(ticket)
+        self.failed.emit(ticket, message)
@@ -0,0 +1,154 @@
+"""
+ایندکس جستجوی نام بیماران
+نام‌ها یک بار نرمال و به کلمه شکسته می‌شوند؛ هر کلمه جستجو با جستجوی دودویی
+روی لیست مرتب کلمات به بیماران می‌رسد (بدون پیمایش همه بیماران در هر کلید)
+"""
+
+from bisect import bisect_left, insort
+
+from utils import normalize_persian
+
+
+def name_tokens(name):
+    """کلمات نرمال‌شده یک نام"""
+    return normalize_persian(name).split()
+
+
+class PatientNameIndex:
+    """ایندکس کلمه/پیشوند نام بیماران - با افزودن تدریجی"""
+
+    def __init__(self):
+        self.token_codes = {}     # کلمه -> مجموعه کدملی‌ها
+        self.sorted_tokens = []   # کلمات یکتا به ترتیب (برای جستجوی پیشوند)
+        self.code_names = {}      # کدملی -> نام نرمال‌شده
+        self.code_tokens = {}     # کدملی -> کلمات نام فعلی
+
+    def __len__(self):
+        return len(self.code_names)
+
+    def add(self, national_code, name):
+        """افزودن یا به‌روزرسانی نام یک بیمار"""
+        tokens = set(name_tokens(name))
+        old_tokens = self.code_tokens.get(national_code, set())
+        if tokens == old_tokens and national_code in self.code_names:
+            return
+
+        for token in old_tokens - tokens:
+            codes = self.token_codes[token]
+            codes.discard(national_code)
+            if not codes:
+                del self.token_codes[token]
+                del self.sorted_tokens[bisect_left(self.sorted_tokens, token)]
+
+        for token in tokens - old_tokens:
+            codes = self.token_codes.get(token)
+            if codes is None:
+                self.token_codes[token] = codes = set()
+                insort(self.sorted_tokens, token)
+            codes.add(national_code)
+
+        self.code_tokens[national_code] = tokens
+        self.code_names[national_code] = normalize_persian(name)
+
+    def _prefix_matches(self, prefix):
+        """کلمه -> مجموعه کدملی برای همه کلماتی که با prefix شروع می‌شوند"""
+        tokens = self.sorted_tokens
+        i = bisect_left(tokens, prefix)
+        matches = {}
+        while i < len(tokens) and tokens[i].startswith(prefix):
+            matches[tokens[i]] = self.token_codes[tokens[i]]
+            i += 1
+        return matches
+
+    def search(self, query):
+        """
+        جستجوی بیماران - هر کلمه جستجو باید پیشوند یکی از کلمات نام باشد
+
+        Returns:
+            لیست (امتیاز، کدملی) - امتیاز بیشتر یعنی تطابق دقیق‌تر
+        """
+        query = normalize_persian(query)
+        words = query.split()
+        if not words:
+            return []
+
+        candidates = None
+        exact = {}
+        for word in words:
+            matched = set()
+            for token, codes in self._prefix_matches(word).items():
+                matched |= codes
+                if token == word:
+                    for code in codes:
+                        exact[code] = exact.get(code, 0) + 1
+            candidates = matched if candidates is None else candidates & matched
+            if not candidates:
+                return []
+
+        # رتبه: کلمات کامل منطبق، سپس شروع نام با عبارت جستجو
+        ranked = []
+        for code in candidates:
+            score = 2 * exact.get(code, 0)
+            if self.code_names[code].startswith(query):
+                score += 1
+            ranked.append((score, code))
+        ranked.sort(key=lambda x: x[1])  # ترتیب ثابت برای امتیازهای برابر
+        return ranked
+
+
+def _linear_search(names, query):
+    """روش قدیمی search_by_name: پیمایش و lower همه نام‌ها (فقط برای مقایسه در بنچمارک)"""
+    query = query.strip().lower()
+    results = []
+    for code, name in names.items():
+        name = name.lower()
+        if query in name or any(query in part for part in name.split()):
+            results.append(code)
+    return results
+
+
+def benchmark_name_search(patients=100000, repeat=3):
+    """مقایسه ایندکس با پیمایش خطی روی تعداد زیادی بیمار ساختگی"""
+    import random
+    import time
+
+    random.seed(0)
+    first = ["علی", "محمد", "مریم", "زهرا", "حسین", "فاطمه", "رضا", "سارا", "امیر", "نرگس",
+             "مهدی", "الهام", "حمید", "ليلا", "كاوه", "محمد‌رضا", "سیدعلی", "یاسمن", "پویا", "نازنین"]
+    last = ["احمدی", "رضایی", "محمدی", "حسینی", "كريمي", "موسوی", "جعفری", "صادقی", "قاسمی",
+            "شهسواری", "تابش", "نوری", "رحیمی", "هاشمی", "اکبری", "زارعی", "عباسی", "کاظمی"]
+    names = {
+        str(1000000000 + i): f"{random.choice(first)} {random.choice(last)}{random.randint(0, 999)}"
+        for i in range(patients)
+    }
+
+    start = time.perf_counter()
+    index = PatientNameIndex()
+    for code, name in names.items():
+        index.add(code, name)
+    build = time.perf_counter() - start
+
+    # شبیه‌سازی تایپ حرف به حرف
+    queries = []
+    for target in ("مریم کریمی", "محمدرضا صادقی12", "شهسواری"):
+        queries.extend(target[:i] for i in range(2, len(target) + 1))
+
+    def timed(func):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for q in queries:
+                func(q)
+            best = min(best, time.perf_counter() - start)
+        return best / len(queries)
+
+    linear = timed(lambda q: _linear_search(names, q))
+    indexed = timed(index.search)
+    print(f"{patients} بیمار - ساخت ایندکس: {build:.2f} s")
+    print(f"  پیمایش خطی: {linear * 1000:.2f} ms برای هر کلید")
+    print(f"  ایندکس:      {indexed * 1000:.2f} ms برای هر کلید")
+    return linear, indexed
+
+
+if __name__ == '__main__':
+    benchmark_name_search()
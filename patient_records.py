@@ -1,42 +1,568 @@
 """
 سیستم مدیریت سوابق بیماران
 ذخیره و بازیابی خودکار سوابق بر اساس کدملی + جستجوی نام
+
+ذخیره‌سازی: snapshot (patient_records.json) + ژورنال فقط‌افزودنی (patient_records.journal).
+هر فاکتور جدید یک خط JSON در ژورنال است (با fsync)؛ ژورنال هر چند وقت یک بار در
+پس‌زمینه با snapshot ادغام می‌شود. هنگام شروع، snapshot و سپس ژورنال بازخوانی می‌شوند.
+
+حالت اشتراکی (shared=True، چند کامپیوتر روی یک پوشه شبکه): هر نوشتن زیر قفل فایل
+(patient_records.lock) انجام می‌شود و شماره آخرین رکورد در patient_records.version
+نوشته می‌شود. اگر این نسخه از seq برنامه جلوتر باشد، رکوردهای بقیه از انتهای ژورنال
+خوانده و ادغام می‌شوند (بدون بارگذاری کامل) و رکورد جدید با seq بعد از آن نوشته می‌شود.
 """
 
+import contextlib
 import json
 import os
+import threading
+from bisect import bisect_left, insort
 from datetime import datetime
 import jdatetime
 
+from patient_name_index import PatientNameIndex
+from utils import write_bytes_atomic
+
+try:
+    import fcntl
+except ImportError:  # ویندوز
+    fcntl = None
+    import msvcrt
+
+
+# کلید اطلاعات داخلی snapshot (شماره آخرین رکورد ژورنال ادغام‌شده)
+META_KEY = "_meta"
+
+# ادغام ژورنال با snapshot بعد از این تعداد فاکتور
+COMPACT_EVERY = 200
+
+
+def journal_paths(records_file):
+    """مسیر ژورنال فعلی و ژورنال در حال ادغام"""
+    journal = os.path.splitext(records_file)[0] + ".journal"
+    return journal, journal + ".compacting"
+
+
+def shared_paths(records_file):
+    """مسیر فایل قفل و فایل نسخه (شماره آخرین رکورد) حالت اشتراکی"""
+    base = os.path.splitext(records_file)[0]
+    return base + ".lock", base + ".version"
+
+
+class RecordsFileLock:
+    """قفل مشورتی (advisory) بین پردازه‌ها و threadها - fcntl در لینوکس/مک، msvcrt در ویندوز"""
+
+    def __init__(self, path):
+        self.path = path
+        self.thread_lock = threading.Lock()
+        self.file = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        try:
+            self.file = open(self.path, 'a+b')
+            if fcntl:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+            else:
+                self.file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK بعد از ۱۰ ثانیه تلاش خطا می‌دهد - دوباره منتظر می‌مانیم
+                        continue
+        except Exception:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            self.thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            if fcntl:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.file.close()
+            self.file = None
+            self.thread_lock.release()
+
+
+def build_invoice_record(patient_data):
+    """رکورد فاکتور ذخیره‌شده در سوابق بیمار (مشترک بین همه نسخه‌های ذخیره‌سازی)"""
+    return {
+        'date': jdatetime.date.today().strftime("%Y/%m/%d"),
+        'datetime': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'tracking_code': patient_data.get('tracking_code', ''),
+        'services': patient_data.get('services', []),
+        'total': patient_data.get('total', 0),
+        'organization': patient_data.get('organization', 0),
+        'patient_pay': patient_data.get('patient_pay', 0),
+        'discount': patient_data.get('discount', 0),
+        'tariff_type': patient_data.get('tariff_type', 'بیمه‌شده'),
+        'pdf_path': patient_data.get('pdf_path', '')
+    }
+
+
+def invoices_page(invoices, offset=0, limit=50):
+    """
+    یک صفحه از لیست فاکتورها (جدیدترین اول)
+
+    Args:
+        offset: تعداد فاکتورهای جدیدتری که رد می‌شوند
+        limit: حداکثر تعداد فاکتور این صفحه
+    """
+    end = len(invoices) - offset
+    if offset < 0 or limit <= 0 or end <= 0:
+        return []
+    return invoices[max(0, end - limit):end][::-1]
+
+
+def patient_summary(national_code, patient):
+    """خلاصه بیمار برای لیست‌ها (جستجو/آخرین بیماران) - patient: سوابق، خلاصه یا ردیف SQLite"""
+    return {
+        'national_code': national_code,
+        'name': patient['name'],
+        'insurance': patient['insurance'],
+        'total_invoices': patient['total_invoices'],
+        'total_amount': patient['total_amount'],
+        'last_visit': patient['last_visit']
+    }
+
+
+def search_patients(name_query, rank, summaries_for):
+    """
+    جستجو بیمار بر اساس نام یا نام خانوادگی (مشترک بین همه نسخه‌های ذخیره‌سازی)
+
+    Args:
+        rank: جستجوی ایندکس نام (PatientNameIndex.search) -> لیست (امتیاز، کدملی)
+        summaries_for: تابع لیست کدملی -> {کدملی: خلاصه}
+
+    Returns:
+        لیستی از بیماران مطابق با جستجو
+    """
+    name_query = name_query.strip().lower()
+
+    if not name_query or len(name_query) < 2:
+        return []
+
+    # فقط بیماران منطبق از ایندکس (هر کلمه جستجو = پیشوند یکی از کلمات نام)
+    ranked = rank(name_query)
+    summaries = summaries_for([code for _, code in ranked])
+    results = [(score, summaries[code]) for score, code in ranked if code in summaries]
+
+    # مرتب‌سازی بر اساس دقت تطابق و سپس آخرین مراجعه
+    results.sort(key=lambda x: (x[0], x[1]['last_visit']), reverse=True)
+
+    return [summary for _, summary in results]
+
+
+def compute_aggregates(patient):
+    """محاسبه خلاصه ذخیره‌شده بیمار از روی فاکتورها (برای سوابق نسخه قبلی)"""
+    invoices = patient['invoices']
+    patient['total_invoices'] = len(invoices)
+    patient['total_amount'] = sum(inv['total'] for inv in invoices)
+    patient['last_visit'] = invoices[-1]['date'] if invoices else 'نامشخص'
+    patient['last_datetime'] = invoices[-1].get('datetime', '') if invoices else ''
+
+
+def apply_journal_entry(records, entry):
+    """اعمال یک رکورد ژورنال (افزودن فاکتور) روی دیکشنری سوابق"""
+    national_code = entry['national_code']
+
+    # اگر بیمار وجود نداشت، ایجاد کن
+    if national_code not in records:
+        records[national_code] = {
+            'name': entry.get('name', ''),
+            'insurance': entry.get('insurance', ''),
+            'total_invoices': 0,
+            'total_amount': 0,
+            'last_visit': 'نامشخص',
+            'last_datetime': '',
+            'invoices': []
+        }
+
+    # آپدیت نام و بیمه (در صورت تغییر)
+    if entry.get('name'):
+        records[national_code]['name'] = entry['name']
+    if entry.get('insurance'):
+        records[national_code]['insurance'] = entry['insurance']
+
+    # افزودن فاکتور + به‌روزرسانی خلاصه (بدون پیمایش فاکتورهای قبلی)
+    patient = records[national_code]
+    invoice = entry['invoice']
+    patient['invoices'].append(invoice)
+    patient['total_invoices'] += 1
+    patient['total_amount'] += invoice['total']
+    patient['last_visit'] = invoice['date']
+    patient['last_datetime'] = invoice.get('datetime', '')
+
+
+def read_snapshot(records_file):
+    """
+    خواندن snapshot
+
+    Returns:
+        (سوابق، شماره آخرین رکورد ژورنال موجود در snapshot)
+    """
+    if not os.path.exists(records_file):
+        return {}, 0
+    with open(records_file, 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    meta = records.pop(META_KEY, None) or {}
+    for patient in records.values():
+        if 'last_datetime' not in patient:
+            compute_aggregates(patient)
+    return records, meta.get('seq', 0)
+
+
+def read_journal_tail(journal_file, offset=0):
+    """
+    رکوردهای کامل ژورنال از offset به بعد (خط ناقص انتها خوانده نمی‌شود)
+
+    Returns:
+        (لیست رکوردها، offset بعد از آخرین رکورد کامل)
+
+    Raises:
+        ValueError: offset وسط یک خط است (ژورنال عوض شده)
+    """
+    entries = []
+    with open(journal_file, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            entries.append(json.loads(line.decode('utf-8')))
+            offset += len(line)
+    return entries, offset
+
+
+def replay_journal(records, journal_file, after_seq, repair=False):
+    """
+    اعمال رکوردهای ژورنال با شماره بزرگتر از after_seq
+
+    Args:
+        repair: خط ناقص انتهای ژورنال حذف شود تا رکوردهای بعدی به آن نچسبند
+
+    Returns:
+        int: شماره آخرین رکورد اعمال‌شده
+    """
+    last_seq = after_seq
+    if not os.path.exists(journal_file):
+        return last_seq
+    good_size = 0
+    with open(journal_file, 'rb') as f:
+        for line in f:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("incomplete line")
+                entry = json.loads(line.decode('utf-8'))
+            except ValueError:
+                # خط ناقص (قطع برق وسط نوشتن) - رکوردهای قبلی سالم هستند
+                print(f"⚠️ خط ناقص در ژورنال سوابق نادیده گرفته شد: {journal_file}")
+                if repair:
+                    with open(journal_file, 'r+b') as rf:
+                        rf.truncate(good_size)
+                break
+            good_size += len(line)
+            if entry['seq'] > last_seq:
+                apply_journal_entry(records, entry)
+                last_seq = entry['seq']
+    return last_seq
+
+
+def read_records(records_file, repair=False):
+    """
+    بازسازی کامل سوابق: snapshot + ژورنال در حال ادغام + ژورنال فعلی
+
+    Returns:
+        (سوابق، شماره آخرین رکورد snapshot، شماره آخرین رکورد)
+    """
+    journal, compacting = journal_paths(records_file)
+    records, snapshot_seq = read_snapshot(records_file)
+    seq = replay_journal(records, compacting, snapshot_seq)
+    seq = replay_journal(records, journal, seq, repair=repair)
+    return records, snapshot_seq, seq
+
+
+def write_snapshot(records_file, records, seq):
+    """نوشتن اتمیک snapshot (فایل موقت + جایگزینی)"""
+    tmp_path = records_file + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({META_KEY: {'seq': seq}, **records}, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, records_file)
+
+
+class RecentVisitIndex:
+    """لیست مرتب (زمان آخرین مراجعه، کدملی) - آخرین N بیمار بدون مرتب‌سازی همه"""
+
+    def __init__(self, items=()):
+        """
+        Args:
+            items: جفت‌های (کدملی، زمان آخرین مراجعه) - یک بار مرتب می‌شوند
+        """
+        # کدملی -> زمان آخرین مراجعه فعلی
+        self.code_keys = dict(items)
+        # (زمان آخرین مراجعه، کدملی) مرتب صعودی
+        self.entries = sorted((key, code) for code, key in self.code_keys.items())
+
+    def update(self, national_code, last_datetime):
+        """ثبت زمان آخرین مراجعه یک بیمار (مراجعه جدید معمولاً به انتهای لیست می‌رود)"""
+        old_key = self.code_keys.get(national_code)
+        if old_key == last_datetime:
+            return
+        if old_key is not None:
+            del self.entries[bisect_left(self.entries, (old_key, national_code))]
+        insort(self.entries, (last_datetime, national_code))
+        self.code_keys[national_code] = last_datetime
+
+    def most_recent(self, limit):
+        """کدملی آخرین limit بیمار (جدیدترین اول)"""
+        return [code for _, code in reversed(self.entries[-limit:])] if limit > 0 else []
+
 
 class PatientRecordsManager:
     """مدیریت سوابق بیماران"""
     
-    def __init__(self, records_file="patient_records.json"):
+    def __init__(self, records_file="patient_records.json", shared=False):
+        """
+        Args:
+            shared: فایل سوابق بین چند برنامه (مثلاً پوشه شبکه) مشترک است
+        """
         self.records_file = records_file
-        self.records = self.load_records()
+        self.journal_file, self.compacting_file = journal_paths(records_file)
+        self.shared = shared
+        lock_file, self.version_file = shared_paths(records_file)
+        # فایل .prev نسخه‌های قبل (بعد از هر ادغام حذف می‌شود)
+        self.previous_file = self.journal_file + ".prev"
+        self.lock = threading.Lock()
+        # قفل بین پردازه‌ها فقط در حالت اشتراکی
+        self.file_lock = RecordsFileLock(lock_file) if shared else contextlib.nullcontext()
+        self.compact_thread = None
+        self.seq = 0
+        self.journal_entries = 0
+        # تا کجای ژورنال فعلی خوانده شده (برای خواندن فقط رکوردهای جدید بقیه)
+        self.journal_offset = 0
+        self.journal = None
+        with self.file_lock:
+            self.records = self.load_records()
+            self._build_indexes()
+            if self.shared and self._read_version() != self.seq:
+                self._write_version()
+
+        # ادغام ناتمام قبلی یا ژورنال بزرگ از اجرای قبل
+        if os.path.exists(self.compacting_file) or self.journal_entries >= COMPACT_EVERY:
+            self.compact_async()
     
+    def _build_indexes(self):
+        # ایندکس نام بیماران (با هر فاکتور جدید به‌روز می‌شود)
+        self.name_index = PatientNameIndex()
+        for national_code, data in self.records.items():
+            self.name_index.add(national_code, data['name'])
+
+        # ایندکس آخرین مراجعه (برای «آخرین بیماران»)
+        self.recent_index = RecentVisitIndex(
+            (code, data['last_datetime']) for code, data in self.records.items()
+        )
+
     def load_records(self):
-        """بارگذاری سوابق از فایل"""
+        """بارگذاری سوابق از فایل (snapshot + ژورنال)"""
         try:
-            if os.path.exists(self.records_file):
-                with open(self.records_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {}
+            records, snapshot_seq, seq = read_records(self.records_file, repair=True)
+            self.seq = seq
+            self.journal_entries = seq - snapshot_seq
+            self.journal_offset = os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0
+            return records
         except Exception as e:
             print(f"⚠️ خطا در بارگذاری سوابق: {e}")
             return {}
-    
+
+    def _read_version(self):
+        """شماره آخرین رکورد نوشته‌شده توسط همه برنامه‌ها (None اگر فایل نباشد/ناقص باشد)"""
+        try:
+            with open(self.version_file, 'r', encoding='utf-8') as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _write_version(self):
+        # نوشتن اتمیک - برنامه دیگر هیچ‌وقت شماره نیمه‌نوشته نمی‌بیند
+        try:
+            write_bytes_atomic(self.version_file, str(self.seq).encode('utf-8'))
+        except OSError as e:
+            # رکورد در ژورنال ثبت شده؛ بقیه با نوشتن نسخه بعدی آن را می‌بینند
+            print(f"⚠️ خطا در نوشتن نسخه سوابق: {e}")
+
+    def _apply_entries(self, entries):
+        """
+        اعمال رکوردهای جدید بقیه برنامه‌ها (به ترتیب seq)
+
+        Returns:
+            False اگر رکوردی جا افتاده باشد (بقیه در snapshot هستند)
+        """
+        for entry in entries:
+            if entry['seq'] <= self.seq:
+                continue
+            if entry['seq'] != self.seq + 1:
+                return False
+            self._apply(entry)
+        return True
+
+    def _apply(self, entry):
+        apply_journal_entry(self.records, entry)
+        self.seq = entry['seq']
+        self.journal_entries += 1
+        national_code = entry['national_code']
+        self.name_index.add(national_code, self.records[national_code]['name'])
+        self.recent_index.update(national_code, self.records[national_code]['last_datetime'])
+
+    def refresh(self):
+        """
+        دریافت فاکتورهایی که برنامه‌های دیگر اضافه کرده‌اند (فقط حالت اشتراکی)
+        اگر نسخه تغییری نکرده باشد فقط یک فایل چندبایتی خوانده می‌شود
+        """
+        if not self.shared or self._read_version() == self.seq:
+            return
+        with self.file_lock, self.lock:
+            self._catch_up()
+
+    def _catch_up(self):
+        """خواندن رکوردهای جدید بقیه برنامه‌ها (با قفل فایل و self.lock)"""
+        version = self._read_version()
+        if version is not None and version <= self.seq:
+            return
+
+        # معمولاً: رکوردهای جدید انتهای همان ژورنال هستند
+        try:
+            entries, offset = read_journal_tail(self.journal_file, self.journal_offset)
+            if self._apply_entries(entries):
+                self.journal_offset = offset
+        except (OSError, ValueError):
+            pass
+        if version is not None and self.seq >= version:
+            return
+
+        # ژورنال توسط برنامه دیگری برای ادغام جابه‌جا شده
+        try:
+            if os.path.exists(self.compacting_file):
+                self._apply_entries(read_journal_tail(self.compacting_file)[0])
+            entries, offset = [], 0
+            if os.path.exists(self.journal_file):
+                entries, offset = read_journal_tail(self.journal_file)
+            if self._apply_entries(entries) and version is not None and self.seq >= version:
+                self.journal_offset = offset
+                self.journal_entries = len(entries)
+                return
+        except ValueError:
+            pass
+
+        # رکوردهایی فقط در snapshot جدید هستند - بارگذاری کامل (نادر)
+        self.records = self.load_records()
+        self._build_indexes()
+        if version != self.seq:
+            self._write_version()
+
     def save_records(self):
-        """ذخیره سوابق در فایل"""
+        """ذخیره کامل سوابق در snapshot و خالی کردن ژورنال"""
+        self.wait_for_compaction()
         try:
-            with open(self.records_file, 'w', encoding='utf-8') as f:
-                json.dump(self.records, f, ensure_ascii=False, indent=2)
+            with self.file_lock, self.lock:
+                # در حالت اشتراکی ابتدا فاکتورهای بقیه ادغام می‌شوند تا حذف نشوند
+                if self.shared:
+                    self._catch_up()
+                write_snapshot(self.records_file, self.records, self.seq)
+                self._close_journal()
+                for path in (self.journal_file, self.compacting_file):
+                    if os.path.exists(path):
+                        os.remove(path)
+                self.journal_entries = 0
+                self.journal_offset = 0
             return True
         except Exception as e:
             print(f"⚠️ خطا در ذخیره سوابق: {e}")
             return False
     
+    def _close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+    
+    def _append_journal(self, entry):
+        """افزودن یک خط به ژورنال + fsync (هزینه ثابت، مستقل از تعداد بیماران)"""
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8')
+        if self.shared:
+            # فایل باز نمی‌ماند تا برنامه دیگر بتواند ژورنال را برای ادغام جابه‌جا کند
+            with open(self.journal_file, 'ab') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+                self.journal_offset = f.tell()
+            return
+        if self.journal is None:
+            self.journal = open(self.journal_file, 'ab')
+        self.journal.write(line)
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+    
+    def compact_async(self):
+        """ادغام ژورنال با snapshot در پس‌زمینه"""
+        if self.compact_thread is not None and self.compact_thread.is_alive():
+            return
+        
+        with self.file_lock, self.lock:
+            if self.shared:
+                self._catch_up()
+            # ژورنال فعلی کنار گذاشته می‌شود؛ فاکتورهای جدید در ژورنال تازه نوشته می‌شوند
+            # (اگر ادغام ناتمام قبلی مانده، اول همان ادغام می‌شود و ژورنال فعلی با
+            # شمارنده‌اش می‌ماند تا add_record بعدی آن را کنار بگذارد)
+            if not os.path.exists(self.compacting_file):
+                self._close_journal()
+                if not os.path.exists(self.journal_file):
+                    return
+                os.replace(self.journal_file, self.compacting_file)
+                self.journal_offset = 0
+                self.journal_entries = 0
+        
+        self.compact_thread = threading.Thread(target=self._compact, daemon=True)
+        self.compact_thread.start()
+    
+    def _compact(self):
+        """snapshot قبلی + ژورنال کنار گذاشته‌شده -> snapshot جدید (بدون دسترسی به self.records)"""
+        try:
+            with self.file_lock:
+                # ممکن است برنامه دیگری همین ژورنال را ادغام کرده باشد
+                if not os.path.exists(self.compacting_file):
+                    return
+                records, seq = read_snapshot(self.records_file)
+                seq = replay_journal(records, self.compacting_file, seq)
+                write_snapshot(self.records_file, records, seq)
+                # snapshot با fsync نوشته شده - ژورنال ادغام‌شده دیگر لازم نیست
+                # (برنامه‌ای که هنوز آن را نخوانده، snapshot جدید را کامل بارگذاری می‌کند)
+                os.remove(self.compacting_file)
+                if os.path.exists(self.previous_file):
+                    os.remove(self.previous_file)
+        except Exception as e:
+            # ژورنال کنار گذاشته‌شده می‌ماند و دفعه بعد دوباره ادغام می‌شود
+            print(f"⚠️ خطا در ادغام ژورنال سوابق: {e}")
+    
+    def wait_for_compaction(self):
+        """منتظر ماندن برای پایان ادغام پس‌زمینه (مثلاً هنگام بستن برنامه)"""
+        if self.compact_thread is not None:
+            self.compact_thread.join()
+    
+    def close(self):
+        """بستن ژورنال"""
+        self.wait_for_compaction()
+        with self.lock:
+            self._close_journal()
+    
     def add_record(self, national_code, patient_data):
         """
         افزودن رکورد جدید برای بیمار
@@ -50,37 +576,32 @@ class PatientRecordsManager:
         
         national_code = national_code.strip()
         
-        # اگر بیمار وجود نداشت، ایجاد کن
-        if national_code not in self.records:
-            self.records[national_code] = {
-                'name': patient_data.get('name', ''),
-                'insurance': patient_data.get('insurance', ''),
-                'invoices': []
-            }
-        
-        # آپدیت نام و بیمه (در صورت تغییر)
-        if patient_data.get('name'):
-            self.records[national_code]['name'] = patient_data['name']
-        if patient_data.get('insurance'):
-            self.records[national_code]['insurance'] = patient_data['insurance']
-        
         # افزودن فاکتور جدید
-        invoice_record = {
-            'date': jdatetime.date.today().strftime("%Y/%m/%d"),
-            'datetime': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            'tracking_code': patient_data.get('tracking_code', ''),
-            'services': patient_data.get('services', []),
-            'total': patient_data.get('total', 0),
-            'organization': patient_data.get('organization', 0),
-            'patient_pay': patient_data.get('patient_pay', 0),
-            'discount': patient_data.get('discount', 0),
-            'tariff_type': patient_data.get('tariff_type', 'بیمه‌شده'),
-            'pdf_path': patient_data.get('pdf_path', '')
-        }
+        invoice_record = build_invoice_record(patient_data)
         
-        self.records[national_code]['invoices'].append(invoice_record)
+        try:
+            with self.file_lock, self.lock:
+                # حالت اشتراکی: اول رکوردهای بقیه، بعد رکورد ما با seq بعدی
+                if self.shared:
+                    self._catch_up()
+                entry = {
+                    'seq': self.seq + 1,
+                    'national_code': national_code,
+                    'name': patient_data.get('name', ''),
+                    'insurance': patient_data.get('insurance', ''),
+                    'invoice': invoice_record
+                }
+                self._append_journal(entry)
+                self._apply(entry)
+                if self.shared:
+                    self._write_version()
+        except Exception as e:
+            print(f"⚠️ خطا در ذخیره سوابق: {e}")
+            return False
         
-        return self.save_records()
+        if self.journal_entries >= COMPACT_EVERY:
+            self.compact_async()
+        return True
     
     def get_patient_records(self, national_code):
         """دریافت سوابق بیمار بر اساس کدملی"""
@@ -88,66 +609,59 @@ class PatientRecordsManager:
             return None
         
         national_code = national_code.strip()
+        self.refresh()
         return self.records.get(national_code, None)
     
-    def get_patient_summary(self, national_code):
-        """دریافت خلاصه سوابق بیمار"""
-        records = self.get_patient_records(national_code)
-        if not records:
-            return None
-        
-        total_invoices = len(records['invoices'])
-        total_amount = sum(inv['total'] for inv in records['invoices'])
-        last_visit = records['invoices'][-1]['date'] if records['invoices'] else 'نامشخص'
-        
-        return {
-            'national_code': national_code,
-            'name': records['name'],
-            'insurance': records['insurance'],
-            'total_invoices': total_invoices,
-            'total_amount': total_amount,
-            'last_visit': last_visit,
-            'invoices': records['invoices']
-        }
-    
-    def search_by_name(self, name_query):
+    def get_patient_summary(self, national_code, include_invoices=True):
         """
-        جستجو بیمار بر اساس نام یا نام خانوادگی
+        دریافت خلاصه سوابق بیمار (از خلاصه ذخیره‌شده در رکورد بیمار)
         
-        Returns:
-            لیستی از بیماران مطابق با جستجو
+        Args:
+            include_invoices: False برای لیست‌ها (جستجو/آخرین بیماران) - بدون کلید invoices
         """
-        name_query = name_query.strip().lower()
+        if self.get_patient_records(national_code) is None:
+            return None
+        return self._summary(national_code.strip(), include_invoices)
+    
+    def _summary(self, national_code, include_invoices=False):
+        """خلاصه از self.records (بدون refresh - برای استفاده زیر self.lock)"""
+        records = self.records.get(national_code)
+        if not records:
+            return None
         
-        if not name_query or len(name_query) < 2:
+        summary = patient_summary(national_code, records)
+        if include_invoices:
+            summary['invoices'] = records['invoices']
+        return summary
+    
+    def get_invoices_page(self, national_code, offset=0, limit=50):
+        """یک صفحه از فاکتورهای بیمار (جدیدترین اول) - offset/limit مثل invoices_page"""
+        records = self.get_patient_records(national_code)
+        if not records:
             return []
-        
-        results = []
-        
-        for national_code, data in self.records.items():
-            patient_name = data['name'].lower()
-            
-            # جستجو در نام کامل یا بخش‌های آن
-            if name_query in patient_name or any(name_query in part for part in patient_name.split()):
-                summary = self.get_patient_summary(national_code)
-                if summary:
-                    results.append(summary)
-        
-        # مرتب‌سازی بر اساس آخرین مراجعه
-        results.sort(key=lambda x: x['last_visit'], reverse=True)
-        
-        return results
+        with self.lock:
+            return invoices_page(records['invoices'], offset, limit)
+    
+    def _summaries(self, codes):
+        """خلاصه چند بیمار (کدملی -> خلاصه) - برای استفاده زیر self.lock"""
+        return {code: patient_summary(code, self.records[code]) for code in codes if code in self.records}
+    
+    def search_by_name(self, name_query):
+        """جستجو بیمار بر اساس نام یا نام خانوادگی (search_patients)"""
+        # قفل: جستجو ممکن است از thread جستجوی پس‌زمینه هم‌زمان با add_record اجرا شود
+        self.refresh()
+        with self.lock:
+            return search_patients(name_query, self.name_index.search, self._summaries)
     
     def get_all_patients(self, limit=100):
-        """دریافت لیست همه بیماران"""
+        """دریافت آخرین limit بیمار (جدیدترین مراجعه اول)"""
         patients = []
         
-        for national_code in list(self.records.keys())[:limit]:
-            summary = self.get_patient_summary(national_code)
-            if summary:
-                patients.append(summary)
-        
-        # مرتب‌سازی بر اساس آخرین مراجعه
-        patients.sort(key=lambda x: x['last_visit'], reverse=True)
+        self.refresh()
+        with self.lock:
+            for national_code in self.recent_index.most_recent(limit):
+                summary = self._summary(national_code)
+                if summary:
+                    patients.append(summary)
         
         return patients
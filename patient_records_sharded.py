@@ -0,0 +1,435 @@
+"""
+سیستم مدیریت سوابق بیماران - نسخه JSON تکه‌تکه (shard)
+همان رابط PatientRecordsManager، ولی سوابق بر اساس دو رقم اول کدملی در فایل‌های جدا
+ذخیره می‌شوند: هر فاکتور فقط یک shard را بازنویسی می‌کند و سوابق هر بیمار فقط با
+خواندن shard خودش (در اولین نیاز) بارگذاری می‌شود.
+
+ساختار پوشه:
+    manifest.json   لیست shardها
+    shard_XX.json   سوابق کامل بیماران با کدملی XX...
+    index.json      خلاصه فشرده همه بیماران (نام، بیمه، تعداد/جمع فاکتور، آخرین مراجعه)
+    index.journal   تغییرات خلاصه‌ها بعد از index.json (هر فاکتور یک خط)
+جستجوی نام و «آخرین بیماران» فقط از ایندکس خلاصه استفاده می‌کنند.
+"""
+
+import json
+import os
+import threading
+
+from patient_name_index import PatientNameIndex
+from patient_records import (
+    COMPACT_EVERY, RecentVisitIndex, apply_journal_entry, build_invoice_record, invoices_page,
+    journal_paths, patient_summary, read_records, search_patients
+)
+
+
+# تعداد رقم‌های ابتدای کدملی که shard را مشخص می‌کند
+PREFIX_LENGTH = 2
+
+# ترتیب فیلدهای خلاصه در index.json (لیست به‌جای دیکشنری = فایل کوچک‌تر)
+SUMMARY_FIELDS = ('name', 'insurance', 'total_invoices', 'total_amount', 'last_visit', 'last_datetime')
+
+
+def shard_key(national_code, prefix_length=PREFIX_LENGTH):
+    """نام shard یک کدملی (کدهای غیرعددی/کوتاه در shard جدا)"""
+    prefix = national_code[:prefix_length]
+    if len(prefix) == prefix_length and prefix.isdigit():
+        return prefix
+    return "other"
+
+
+def write_json_atomic(path, data):
+    """نوشتن اتمیک فایل JSON (فایل موقت + جایگزینی)"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def patient_summary_row(patient):
+    """خلاصه فشرده یک بیمار برای index.json"""
+    return [patient[field] for field in SUMMARY_FIELDS]
+
+
+def merge_patient(current, imported):
+    """
+    ادغام سوابق واردشده با سوابق موجود یک بیمار
+
+    فاکتورهای قدیمی (واردشده) اول و فاکتورهای موجود بعد از آن‌ها؛ فاکتور تکراری
+    اضافه نمی‌شود تا اجرای دوباره انتقال سوابق را دو برابر نکند.
+    """
+    if not current:
+        return imported
+    invoices = list(imported.get('invoices', []))
+    invoices += [invoice for invoice in current['invoices'] if invoice not in invoices]
+    merged = dict(current)
+    merged['name'] = current['name'] or imported.get('name', '')
+    merged['insurance'] = current['insurance'] or imported.get('insurance', '')
+    merged['invoices'] = invoices
+    merged['total_invoices'] = len(invoices)
+    merged['total_amount'] = sum(invoice.get('total', 0) for invoice in invoices)
+    if invoices:
+        merged['last_visit'] = invoices[-1].get('date', 'نامشخص')
+        merged['last_datetime'] = invoices[-1].get('datetime', '')
+    return merged
+
+
+class ShardedPatientRecordsManager:
+    """مدیریت سوابق بیماران در فایل‌های JSON جدا بر اساس پیشوند کدملی"""
+
+    def __init__(self, records_dir="patient_records", json_file="patient_records.json"):
+        self.records_dir = records_dir
+        self.manifest_file = os.path.join(records_dir, "manifest.json")
+        self.index_file = os.path.join(records_dir, "index.json")
+        self.index_journal_file = os.path.join(records_dir, "index.journal")
+        self.lock = threading.Lock()
+        self.shards = {}            # shard بارگذاری‌شده -> {کدملی: سوابق}
+        self.index_journal = None
+        self.index_entries = 0        # تعداد خطوط index.journal
+        self.last_index_code = None   # کدملی آخرین خط index.journal
+
+        os.makedirs(records_dir, exist_ok=True)
+        self.manifest = self._read_manifest()
+
+        # انتقال یک‌باره سوابق قدیمی از فایل JSON (+ ژورنال آن)
+        if json_file and not self.manifest.get('imported_json') and any(
+            os.path.exists(path) for path in (json_file, *journal_paths(json_file))
+        ):
+            self.import_from_json(json_file)
+
+        # کدملی -> خلاصه (بدون فاکتورها)
+        self.summaries = self._load_index()
+        self._check_last_index_entry()
+
+        self.name_index = PatientNameIndex()
+        for national_code, summary in self.summaries.items():
+            self.name_index.add(national_code, summary['name'])
+        self.recent_index = RecentVisitIndex(
+            (code, summary['last_datetime']) for code, summary in self.summaries.items()
+        )
+
+        if self.index_entries >= COMPACT_EVERY:
+            self.save_records()
+
+    # ---------- فایل‌ها ----------
+
+    def _shard_file(self, key):
+        return os.path.join(self.records_dir, f"shard_{key}.json")
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_file):
+            return {'version': 1, 'prefix_length': PREFIX_LENGTH, 'shards': []}
+        with open(self.manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_manifest(self):
+        write_json_atomic(self.manifest_file, self.manifest)
+
+    def _key(self, national_code):
+        return shard_key(national_code, self.manifest['prefix_length'])
+
+    def _load_shard(self, key):
+        """سوابق یک shard (فقط در اولین نیاز از دیسک خوانده می‌شود)"""
+        shard = self.shards.get(key)
+        if shard is None:
+            shard = {}
+            path = self._shard_file(key)
+            if key in self.manifest['shards'] and os.path.exists(path):
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        shard = json.load(f)
+                except Exception as e:
+                    print(f"⚠️ خطا در بارگذاری سوابق {path}: {e}")
+                    raise
+            self.shards[key] = shard
+        return shard
+
+    def _load_index(self):
+        """خلاصه بیماران: index.json + index.journal (در نبود ایندکس، بازسازی از shardها)"""
+        summaries = {}
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                summaries = {code: dict(zip(SUMMARY_FIELDS, row)) for code, row in data.items()}
+            elif self.manifest['shards']:
+                return self.rebuild_index()
+        except Exception as e:
+            print(f"⚠️ خطا در خواندن ایندکس سوابق، بازسازی از shardها: {e}")
+            return self.rebuild_index()
+
+        if os.path.exists(self.index_journal_file):
+            good_size = 0
+            with open(self.index_journal_file, 'rb') as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("incomplete line")
+                        entry = json.loads(line.decode('utf-8'))
+                    except ValueError:
+                        print(f"⚠️ خط ناقص در ژورنال ایندکس نادیده گرفته شد: {self.index_journal_file}")
+                        with open(self.index_journal_file, 'r+b') as rf:
+                            rf.truncate(good_size)
+                        break
+                    good_size += len(line)
+                    if entry['summary'] is None:
+                        summaries.pop(entry['national_code'], None)
+                    else:
+                        summaries[entry['national_code']] = dict(zip(SUMMARY_FIELDS, entry['summary']))
+                    self.last_index_code = entry['national_code']
+                    self.index_entries += 1
+        return summaries
+
+    def _check_last_index_entry(self):
+        """
+        هم‌خوانی آخرین خط index.journal با shard بیمار
+
+        خلاصه قبل از shard نوشته می‌شود؛ اگر برنامه بین این دو بسته شده باشد،
+        خلاصه از روی shard (که فاکتور جدید را ندارد) اصلاح می‌شود.
+        """
+        national_code = self.last_index_code
+        if national_code is None:
+            return
+        try:
+            patient = self._load_shard(self._key(national_code)).get(national_code)
+        except Exception:
+            return
+        summary = self.summaries.get(national_code)
+        row = patient_summary_row(patient) if patient is not None else None
+        current = [summary[field] for field in SUMMARY_FIELDS] if summary is not None else None
+        if row == current:
+            return
+        if row is None:
+            del self.summaries[national_code]
+        else:
+            self.summaries[national_code] = dict(zip(SUMMARY_FIELDS, row))
+        try:
+            self._append_index(national_code, row)
+        except Exception as e:
+            print(f"⚠️ خطا در اصلاح ایندکس سوابق: {e}")
+
+    def rebuild_index(self):
+        """ساخت دوباره index.json از روی همه shardها (فقط وقتی ایندکس گم یا خراب شده)"""
+        summaries = {}
+        for key in self.manifest['shards']:
+            for national_code, patient in self._load_shard(key).items():
+                summaries[national_code] = dict(zip(SUMMARY_FIELDS, patient_summary_row(patient)))
+        self._write_index(summaries)
+        # shardها دوباره فقط در صورت نیاز خوانده می‌شوند
+        self.shards.clear()
+        return summaries
+
+    def _write_index(self, summaries):
+        """نوشتن index.json و خالی کردن ژورنال ایندکس"""
+        write_json_atomic(self.index_file, {
+            code: [summary[field] for field in SUMMARY_FIELDS] for code, summary in summaries.items()
+        })
+        self._close_index_journal()
+        if os.path.exists(self.index_journal_file):
+            os.remove(self.index_journal_file)
+        self.index_entries = 0
+        self.last_index_code = None
+
+    def _close_index_journal(self):
+        if self.index_journal is not None:
+            self.index_journal.close()
+            self.index_journal = None
+
+    def _append_index(self, national_code, row):
+        """افزودن خلاصه جدید یک بیمار به ژورنال ایندکس + fsync (None = حذف بیمار از ایندکس)"""
+        if self.index_journal is None:
+            self.index_journal = open(self.index_journal_file, 'a', encoding='utf-8')
+        entry = {'national_code': national_code, 'summary': row}
+        self.index_journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.index_journal.flush()
+        os.fsync(self.index_journal.fileno())
+        self.index_entries += 1
+        self.last_index_code = national_code
+
+    def _revert_index(self, national_code):
+        """برگرداندن خلاصه بیمار در ژورنال ایندکس بعد از شکست نوشتن shard"""
+        summary = self.summaries.get(national_code)
+        try:
+            self._append_index(
+                national_code, [summary[field] for field in SUMMARY_FIELDS] if summary is not None else None
+            )
+        except Exception as e:
+            # در شروع بعدی با _check_last_index_entry اصلاح می‌شود
+            print(f"⚠️ خطا در برگرداندن ایندکس سوابق: {e}")
+
+    def import_from_json(self, json_file="patient_records.json"):
+        """
+        تقسیم سوابق فایل JSON نسخه قبلی (و ژورنال آن) بین shardها
+
+        Returns:
+            int: تعداد بیماران وارد شده
+        """
+        try:
+            records, _, _ = read_records(json_file)
+        except Exception as e:
+            print(f"⚠️ خطا در خواندن سوابق JSON: {e}")
+            return 0
+
+        try:
+            with self.lock:
+                shards = {}
+                for national_code, patient in records.items():
+                    shards.setdefault(self._key(national_code), {})[national_code] = patient
+                for key, shard in shards.items():
+                    existing = self._load_shard(key)
+                    for national_code, patient in shard.items():
+                        existing[national_code] = merge_patient(existing.get(national_code), patient)
+                    write_json_atomic(self._shard_file(key), existing)
+                self.manifest['shards'] = sorted(set(self.manifest['shards']) | set(shards))
+                self.manifest['imported_json'] = os.path.abspath(json_file)
+                self._write_manifest()
+                # ایندکس بعد از انتقال از روی shardها ساخته می‌شود
+                if os.path.exists(self.index_file):
+                    os.remove(self.index_file)
+            print(f"✅ {len(records)} بیمار از {json_file} منتقل شد")
+            return len(records)
+        except Exception as e:
+            print(f"⚠️ خطا در انتقال سوابق به shardها: {e}")
+            return 0
+
+    # ---------- رابط PatientRecordsManager ----------
+
+    def load_records(self):
+        """سازگاری با نسخه JSON - shardها فقط در صورت نیاز خوانده می‌شوند"""
+        return {}
+
+    def save_records(self):
+        """ادغام ژورنال ایندکس با index.json (shardها همیشه به‌روز هستند)"""
+        try:
+            with self.lock:
+                self._write_index(self.summaries)
+            return True
+        except Exception as e:
+            print(f"⚠️ خطا در ذخیره ایندکس سوابق: {e}")
+            return False
+
+    def close(self):
+        """بستن ژورنال ایندکس"""
+        with self.lock:
+            self._close_index_journal()
+
+    def add_record(self, national_code, patient_data):
+        """
+        افزودن رکورد جدید برای بیمار (فقط shard همان بیمار بازنویسی می‌شود)
+
+        Args:
+            national_code: کدملی بیمار
+            patient_data: دیکشنری حاوی اطلاعات بیمار و فاکتور
+        """
+        if not national_code or national_code.strip() == "":
+            return False
+
+        national_code = national_code.strip()
+
+        invoice_record = build_invoice_record(patient_data)
+
+        try:
+            with self.lock:
+                key = self._key(national_code)
+                shard = self._load_shard(key)
+                entry = {
+                    'national_code': national_code,
+                    'name': patient_data.get('name', ''),
+                    'insurance': patient_data.get('insurance', ''),
+                    'invoice': invoice_record
+                }
+                apply_journal_entry(shard, entry)
+                patient = shard[national_code]
+
+                # ترتیب نوشتن: manifest، خلاصه، shard - بسته شدن برنامه در میانه هیچ بیماری را
+                # از ایندکس جا نمی‌اندازد و خلاصه جلوتر از shard در شروع بعدی اصلاح می‌شود
+                try:
+                    if key not in self.manifest['shards']:
+                        self.manifest['shards'] = sorted(self.manifest['shards'] + [key])
+                        self._write_manifest()
+                    self._append_index(national_code, patient_summary_row(patient))
+                    write_json_atomic(self._shard_file(key), shard)
+                except Exception:
+                    # حافظه با دیسک هم‌خوان بماند - shard دوباره از فایل خوانده شود
+                    del self.shards[key]
+                    if self.last_index_code == national_code:
+                        self._revert_index(national_code)
+                    raise
+
+                self.summaries[national_code] = dict(zip(SUMMARY_FIELDS, patient_summary_row(patient)))
+                self.name_index.add(national_code, patient['name'])
+                self.recent_index.update(national_code, patient['last_datetime'])
+        except Exception as e:
+            print(f"⚠️ خطا در ذخیره سوابق: {e}")
+            return False
+
+        if self.index_entries >= COMPACT_EVERY:
+            self.save_records()
+        return True
+
+    def get_patient_records(self, national_code):
+        """دریافت سوابق بیمار بر اساس کدملی (فقط shard همان بیمار خوانده می‌شود)"""
+        if not national_code:
+            return None
+
+        national_code = national_code.strip()
+        if national_code not in self.summaries:
+            return None
+        try:
+            with self.lock:
+                patient = self._load_shard(self._key(national_code)).get(national_code)
+        except Exception:
+            return None
+        return patient
+
+    def _summary(self, national_code):
+        summary = self.summaries.get(national_code)
+        if summary is None:
+            return None
+        return patient_summary(national_code, summary)
+
+    def _summaries(self, codes):
+        """خلاصه چند بیمار (کدملی -> خلاصه) - برای استفاده زیر self.lock"""
+        return {code: patient_summary(code, self.summaries[code]) for code in codes if code in self.summaries}
+
+    def get_patient_summary(self, national_code, include_invoices=True):
+        """
+        دریافت خلاصه سوابق بیمار (از ایندکس خلاصه‌ها)
+
+        Args:
+            include_invoices: False برای لیست‌ها (جستجو/آخرین بیماران) - بدون خواندن shard
+        """
+        if not national_code:
+            return None
+
+        national_code = national_code.strip()
+        with self.lock:
+            summary = self._summary(national_code)
+        if summary and include_invoices:
+            records = self.get_patient_records(national_code)
+            summary['invoices'] = records['invoices'] if records else []
+        return summary
+
+    def get_invoices_page(self, national_code, offset=0, limit=50):
+        """یک صفحه از فاکتورهای بیمار (جدیدترین اول) - offset/limit مثل invoices_page"""
+        records = self.get_patient_records(national_code)
+        if not records:
+            return []
+        with self.lock:
+            return invoices_page(records['invoices'], offset, limit)
+
+    def search_by_name(self, name_query):
+        """جستجو بیمار بر اساس نام (search_patients - فقط ایندکس، بدون خواندن shardها)"""
+        with self.lock:
+            return search_patients(name_query, self.name_index.search, self._summaries)
+
+    def get_all_patients(self, limit=100):
+        """دریافت آخرین limit بیمار (جدیدترین مراجعه اول)"""
+        with self.lock:
+            return [
+                self._summary(national_code)
+                for national_code in self.recent_index.most_recent(limit)
+                if national_code in self.summaries
+            ]
@@ -0,0 +1,391 @@
+"""
+سیستم مدیریت سوابق بیماران - نسخه SQLite
+همان رابط PatientRecordsManager، ولی هر فاکتور فقط یک INSERT است و جستجو با
+ایندکس کدملی/نام/تاریخ انجام می‌شود (بدون بارگذاری و بازنویسی کل فایل JSON)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+from patient_name_index import PatientNameIndex
+from patient_records import (
+    build_invoice_record, journal_paths, patient_summary, read_records, search_patients
+)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
+    national_code TEXT PRIMARY KEY,
+    name TEXT NOT NULL DEFAULT '',
+    name_lower TEXT NOT NULL DEFAULT '',
+    insurance TEXT NOT NULL DEFAULT '',
+    total_invoices INTEGER NOT NULL DEFAULT 0,
+    total_amount INTEGER NOT NULL DEFAULT 0,
+    last_visit TEXT NOT NULL DEFAULT 'نامشخص',
+    last_datetime TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS invoices (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    national_code TEXT NOT NULL REFERENCES patients(national_code),
+    date TEXT NOT NULL DEFAULT '',
+    datetime TEXT NOT NULL DEFAULT '',
+    tracking_code TEXT NOT NULL DEFAULT '',
+    services TEXT NOT NULL DEFAULT '[]',
+    total INTEGER NOT NULL DEFAULT 0,
+    organization INTEGER NOT NULL DEFAULT 0,
+    patient_pay INTEGER NOT NULL DEFAULT 0,
+    discount INTEGER NOT NULL DEFAULT 0,
+    tariff_type TEXT NOT NULL DEFAULT '',
+    pdf_path TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_patients_name ON patients(name_lower);
+CREATE INDEX IF NOT EXISTS idx_invoices_patient ON invoices(national_code, id);
+CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(date);
+"""
+
+# خلاصه ذخیره‌شده هر بیمار (ستون‌ها در پایگاه داده‌های نسخه قبل اضافه می‌شوند)
+AGGREGATE_COLUMNS = {
+    'total_invoices': "INTEGER NOT NULL DEFAULT 0",
+    'total_amount': "INTEGER NOT NULL DEFAULT 0",
+    'last_visit': "TEXT NOT NULL DEFAULT 'نامشخص'",
+    'last_datetime': "TEXT NOT NULL DEFAULT ''",
+}
+
+REFRESH_AGGREGATES_SQL = """
+UPDATE patients SET
+    total_invoices = (SELECT COUNT(*) FROM invoices i WHERE i.national_code = patients.national_code),
+    total_amount = (SELECT COALESCE(SUM(total), 0) FROM invoices i WHERE i.national_code = patients.national_code),
+    last_visit = COALESCE(
+        (SELECT date FROM invoices i WHERE i.national_code = patients.national_code ORDER BY datetime DESC, id DESC LIMIT 1),
+        'نامشخص'
+    ),
+    last_datetime = COALESCE(
+        (SELECT datetime FROM invoices i WHERE i.national_code = patients.national_code ORDER BY datetime DESC, id DESC LIMIT 1),
+        ''
+    )
+"""
+
+SUMMARY_COLUMNS = "national_code, name, insurance, total_invoices, total_amount, last_visit"
+
+# کلید یکتای فاکتور - فاکتوری که قبلاً ذخیره شده دوباره وارد نمی‌شود
+# (فقط فاکتورهای دارای PDF - نام فایل PDF یکتاست؛ add_record بدون PDF هیچ‌وقت رد نمی‌شود)
+INVOICE_KEY_SQL = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_invoices_key "
+    "ON invoices(national_code, datetime, tracking_code, pdf_path) WHERE pdf_path != ''"
+)
+
+DEDUPLICATE_INVOICES_SQL = """
+DELETE FROM invoices WHERE pdf_path != '' AND id NOT IN (
+    SELECT MIN(id) FROM invoices WHERE pdf_path != ''
+    GROUP BY national_code, datetime, tracking_code, pdf_path
+)
+"""
+
+# فاکتورهای بدون PDF با همان کلید جستجو می‌شوند (ایندکس کدملی)
+IMPORT_INVOICE_SQL = """
+INSERT OR IGNORE INTO invoices (national_code, date, datetime, tracking_code, services,
+    total, organization, patient_pay, discount, tariff_type, pdf_path)
+SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+WHERE NOT EXISTS (
+    SELECT 1 FROM invoices WHERE national_code = ?1 AND datetime = ?3 AND tracking_code = ?4 AND pdf_path = ?11
+)
+"""
+
+INVOICE_FIELDS = (
+    'date', 'datetime', 'tracking_code', 'services', 'total',
+    'organization', 'patient_pay', 'discount', 'tariff_type', 'pdf_path'
+)
+
+
+class SQLitePatientRecordsManager:
+    """مدیریت سوابق بیماران روی SQLite"""
+
+    def __init__(self, db_file="patient_records.db", json_file="patient_records.json"):
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self._add_aggregate_columns()
+        self._add_invoice_key()
+
+        # ایندکس نام بیماران در حافظه (همان رتبه‌بندی نسخه JSON)
+        self.name_index = PatientNameIndex()
+
+        # انتقال سوابق فایل JSON (+ ژورنال آن) - دوباره فقط اگر فایل‌ها بعد از انتقال قبلی تغییر کرده باشند
+        if json_file and self._json_state(json_file) not in (None, self._get_meta('imported_json_state')):
+            self.import_from_json(json_file)
+
+        for row in self.conn.execute("SELECT national_code, name FROM patients"):
+            self.name_index.add(row['national_code'], row['name'])
+
+    def _add_aggregate_columns(self):
+        """افزودن ستون‌های خلاصه به پایگاه داده نسخه قبل و محاسبه یک‌باره آن‌ها"""
+        existing = {row['name'] for row in self.conn.execute("PRAGMA table_info(patients)")}
+        missing = [col for col in AGGREGATE_COLUMNS if col not in existing]
+        with self.conn:
+            if missing:
+                for col in missing:
+                    self.conn.execute(f"ALTER TABLE patients ADD COLUMN {col} {AGGREGATE_COLUMNS[col]}")
+                self.conn.execute(REFRESH_AGGREGATES_SQL)
+            # ایندکس آخرین مراجعه (بعد از افزودن ستون در پایگاه داده‌های قدیمی)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_recent ON patients(last_datetime, national_code)")
+
+    def _add_invoice_key(self):
+        """ایندکس یکتای فاکتورها (تکراری‌های انتقال‌های قبلی یک بار حذف می‌شوند)"""
+        if self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_invoices_key'").fetchone():
+            return
+        with self.conn:
+            if self.conn.execute(DEDUPLICATE_INVOICES_SQL).rowcount:
+                self.conn.execute(REFRESH_AGGREGATES_SQL)
+            self.conn.execute(INVOICE_KEY_SQL)
+
+    @staticmethod
+    def _json_state(json_file):
+        """اندازه و زمان تغییر فایل JSON و ژورنال‌هایش (None اگر هیچ‌کدام نباشد)"""
+        state = []
+        for path in (json_file, *journal_paths(json_file)):
+            if os.path.exists(path):
+                stat = os.stat(path)
+                state.append([os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+        return json.dumps(state) if state else None
+
+    def _get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def import_from_json(self, json_file="patient_records.json"):
+        """
+        وارد کردن سوابق از فایل JSON نسخه قبلی و ژورنال آن (یک تراکنش)
+        فقط فاکتورهایی اضافه می‌شوند که هنوز در پایگاه داده نیستند (کلید idx_invoices_key)؛
+        فاکتورهای ثبت‌شده در SQLite و نام/بیمه فعلی بیماران دست نمی‌خورند.
+
+        Returns:
+            int: تعداد بیماران وارد شده
+        """
+        state = self._json_state(json_file)
+        try:
+            records, _, _ = read_records(json_file)
+        except Exception as e:
+            print(f"⚠️ خطا در خواندن سوابق JSON: {e}")
+            return 0
+
+        try:
+            with self.lock, self.conn:
+                for national_code, data in records.items():
+                    name = data.get('name', '')
+                    self.conn.execute(
+                        "INSERT OR IGNORE INTO patients (national_code, name, name_lower, insurance) "
+                        "VALUES (?, ?, ?, ?)",
+                        (national_code, name, name.lower(), data.get('insurance', ''))
+                    )
+                    self.conn.executemany(
+                        IMPORT_INVOICE_SQL,
+                        [self._invoice_row(national_code, inv) for inv in data.get('invoices', [])]
+                    )
+                self.conn.execute(REFRESH_AGGREGATES_SQL)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('imported_json', ?)",
+                    (os.path.abspath(json_file),)
+                )
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('imported_json_state', ?)", (state,)
+                )
+                for row in self.conn.execute("SELECT national_code, name FROM patients"):
+                    if row['national_code'] in records:
+                        self.name_index.add(row['national_code'], row['name'])
+            print(f"✅ {len(records)} بیمار از {json_file} منتقل شد")
+            return len(records)
+        except Exception as e:
+            print(f"⚠️ خطا در انتقال سوابق به SQLite: {e}")
+            return 0
+
+    @staticmethod
+    def _invoice_row(national_code, invoice):
+        return (
+            national_code,
+            invoice.get('date', ''),
+            invoice.get('datetime', ''),
+            invoice.get('tracking_code', ''),
+            json.dumps(invoice.get('services', []), ensure_ascii=False),
+            invoice.get('total', 0),
+            invoice.get('organization', 0),
+            invoice.get('patient_pay', 0),
+            invoice.get('discount', 0),
+            invoice.get('tariff_type', 'بیمه‌شده'),
+            invoice.get('pdf_path', ''),
+        )
+
+    @staticmethod
+    def _invoice_from_row(row):
+        invoice = {field: row[field] for field in INVOICE_FIELDS}
+        invoice['services'] = json.loads(row['services'])
+        return invoice
+
+    def load_records(self):
+        """سازگاری با نسخه JSON - داده‌ها در پایگاه داده هستند"""
+        return {}
+
+    def save_records(self):
+        """سازگاری با نسخه JSON - هر تغییر همان لحظه commit می‌شود"""
+        return True
+
+    def add_record(self, national_code, patient_data):
+        """
+        افزودن رکورد جدید برای بیمار
+
+        Args:
+            national_code: کدملی بیمار
+            patient_data: دیکشنری حاوی اطلاعات بیمار و فاکتور
+        """
+        if not national_code or national_code.strip() == "":
+            return False
+
+        national_code = national_code.strip()
+
+        invoice_record = build_invoice_record(patient_data)
+
+        try:
+            with self.lock, self.conn:
+                name = patient_data.get('name', '')
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO patients (national_code, name, name_lower, insurance) "
+                    "VALUES (?, ?, ?, ?)",
+                    (national_code, name, name.lower(), patient_data.get('insurance', ''))
+                )
+
+                # آپدیت نام و بیمه (در صورت تغییر)
+                if patient_data.get('name'):
+                    self.conn.execute(
+                        "UPDATE patients SET name = ?, name_lower = ? WHERE national_code = ?",
+                        (name, name.lower(), national_code)
+                    )
+                if patient_data.get('insurance'):
+                    self.conn.execute(
+                        "UPDATE patients SET insurance = ? WHERE national_code = ?",
+                        (patient_data['insurance'], national_code)
+                    )
+
+                self.conn.execute(
+                    "INSERT INTO invoices (national_code, date, datetime, tracking_code, services, "
+                    "total, organization, patient_pay, discount, tariff_type, pdf_path) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    self._invoice_row(national_code, invoice_record)
+                )
+                self.conn.execute(
+                    "UPDATE patients SET total_invoices = total_invoices + 1, "
+                    "total_amount = total_amount + ?, last_visit = ?, last_datetime = ? WHERE national_code = ?",
+                    (invoice_record['total'], invoice_record['date'], invoice_record['datetime'], national_code)
+                )
+                current = self.conn.execute(
+                    "SELECT name FROM patients WHERE national_code = ?", (national_code,)
+                ).fetchone()
+                self.name_index.add(national_code, current['name'])
+            return True
+        except Exception as e:
+            print(f"⚠️ خطا در ذخیره سوابق: {e}")
+            return False
+
+    def get_patient_records(self, national_code):
+        """دریافت سوابق بیمار بر اساس کدملی"""
+        if not national_code:
+            return None
+
+        national_code = national_code.strip()
+        with self.lock:
+            patient = self.conn.execute(
+                "SELECT name, insurance FROM patients WHERE national_code = ?", (national_code,)
+            ).fetchone()
+            if patient is None:
+                return None
+            rows = self.conn.execute(
+                "SELECT * FROM invoices WHERE national_code = ? ORDER BY id", (national_code,)
+            ).fetchall()
+
+        return {
+            'name': patient['name'],
+            'insurance': patient['insurance'],
+            'invoices': [self._invoice_from_row(row) for row in rows]
+        }
+
+    def _summaries(self, codes):
+        """خلاصه ذخیره‌شده چند بیمار بدون خواندن فاکتورها (کدملی -> خلاصه)"""
+        summaries = {}
+        codes = list(codes)
+        with self.lock:
+            # محدودیت تعداد پارامتر SQLite
+            for i in range(0, len(codes), 500):
+                chunk = codes[i:i + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                for row in self.conn.execute(
+                    f"SELECT {SUMMARY_COLUMNS} FROM patients WHERE national_code IN ({placeholders})", chunk
+                ):
+                    summaries[row['national_code']] = patient_summary(row['national_code'], row)
+        return summaries
+
+    def get_patient_summary(self, national_code, include_invoices=True):
+        """
+        دریافت خلاصه سوابق بیمار (از خلاصه ذخیره‌شده در جدول بیماران)
+
+        Args:
+            include_invoices: False برای لیست‌ها (جستجو/آخرین بیماران) - بدون کلید invoices
+        """
+        if not national_code:
+            return None
+
+        national_code = national_code.strip()
+        summary = self._summaries([national_code]).get(national_code)
+        if summary and include_invoices:
+            records = self.get_patient_records(national_code)
+            summary['invoices'] = records['invoices'] if records else []
+        return summary
+
+    def get_invoices_page(self, national_code, offset=0, limit=50):
+        """
+        یک صفحه از فاکتورهای بیمار (جدیدترین اول - از ایندکس کدملی/شناسه)
+
+        Args:
+            offset: تعداد فاکتورهای جدیدتری که رد می‌شوند
+            limit: حداکثر تعداد فاکتور این صفحه
+        """
+        if not national_code or offset < 0 or limit <= 0:
+            return []
+
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM invoices WHERE national_code = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+                (national_code.strip(), limit, offset)
+            ).fetchall()
+        return [self._invoice_from_row(row) for row in rows]
+
+    def _rank_names(self, name_query):
+        with self.lock:
+            return self.name_index.search(name_query)
+
+    def search_by_name(self, name_query):
+        """جستجو بیمار بر اساس نام (search_patients - خلاصه‌ها بدون خواندن فاکتورها)"""
+        return search_patients(name_query, self._rank_names, self._summaries)
+
+    def get_all_patients(self, limit=100):
+        """دریافت آخرین limit بیمار (جدیدترین مراجعه اول - از ایندکس last_datetime)"""
+        with self.lock:
+            return [
+                patient_summary(row['national_code'], row) for row in self.conn.execute(
+                    f"SELECT {SUMMARY_COLUMNS} FROM patients "
+                    "ORDER BY last_datetime DESC, national_code DESC LIMIT ?", (limit,)
+                )
+            ]
+
+    def close(self):
+        """بستن اتصال پایگاه داده"""
+        with self.lock:
+            self.conn.close()
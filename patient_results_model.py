@@ -0,0 +1,191 @@
+"""
+مدل‌های جدول نتایج جستجوی بیماران و سوابق فاکتورها (Model/View)
+ردیف‌ها تکه‌تکه (fetchMore) به جدول داده می‌شوند و دکمه‌های ستون عملیات به‌جای یک
+QPushButton برای هر ردیف، توسط delegate فقط برای ردیف‌های قابل مشاهده کشیده می‌شوند
+"""
+
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QEvent, pyqtSignal
+from PyQt6.QtWidgets import QStyledItemDelegate, QStyleOptionButton, QStyle, QApplication
+
+HEADERS = ["نام و نام خانوادگی", "کد ملی", "بیمه", "تعداد مراجعات", "آخرین مراجعه", "عملیات"]
+SELECT_COLUMN = 5
+SELECT_TEXT = "✅ انتخاب"
+
+# تعداد ردیف‌هایی که در هر fetchMore به جدول اضافه می‌شود
+FETCH_BATCH = 100
+
+INVOICE_HEADERS = ["تاریخ", "کد پیگیری", "نوع تعرفه", "جمع کل", "سهم بیمار", "عملیات"]
+OPEN_COLUMN = 5
+OPEN_TEXT = "📄 مشاهده"
+
+# تعداد فاکتورهایی که در هر صفحه از مدیریت سوابق خوانده می‌شود
+INVOICE_PAGE_SIZE = 50
+
+
+class PatientResultsModel(QAbstractTableModel):
+    """مدل نتایج جستجو - لیست خلاصه بیماران (خروجی search_by_name / get_all_patients)"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.patients = []
+        self.loaded = 0  # تعداد ردیف‌هایی که تا الان به view داده شده
+
+    def set_patients(self, patients):
+        """جایگزینی کل نتایج (فقط دسته اول ردیف‌ها به view داده می‌شود)"""
+        self.beginResetModel()
+        self.patients = list(patients or [])
+        self.loaded = min(FETCH_BATCH, len(self.patients))
+        self.endResetModel()
+
+    def patient(self, row):
+        """خلاصه بیمار ردیف row (یا None)"""
+        if 0 <= row < self.loaded:
+            return self.patients[row]
+        return None
+
+    # ---------- بارگذاری تدریجی ----------
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self.loaded < len(self.patients)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(FETCH_BATCH, len(self.patients) - self.loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    # ---------- رابط QAbstractTableModel ----------
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+
+        patient = self.patients[index.row()]
+        column = index.column()
+        if column == 0:
+            return patient['name']
+        if column == 1:
+            return patient['national_code']
+        if column == 2:
+            return patient['insurance']
+        if column == 3:
+            return str(patient['total_invoices'])
+        if column == 4:
+            return patient['last_visit']
+        return SELECT_TEXT
+
+
+class InvoiceHistoryModel(QAbstractTableModel):
+    """مدل سوابق فاکتور یک بیمار - صفحه‌ها هنگام اسکرول از مدیریت سوابق خوانده می‌شوند"""
+
+    def __init__(self, fetch_page, total, parent=None):
+        """
+        Args:
+            fetch_page: تابع (offset, limit) -> لیست فاکتورها (جدیدترین اول)
+            total: تعداد کل فاکتورهای بیمار
+        """
+        super().__init__(parent)
+        self.fetch_page = fetch_page
+        self.total = total
+        self.invoices = []
+
+    def invoice(self, row):
+        """فاکتور ردیف row (یا None)"""
+        if 0 <= row < len(self.invoices):
+            return self.invoices[row]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return len(self.invoices) < self.total
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        page = self.fetch_page(len(self.invoices), INVOICE_PAGE_SIZE)
+        if not page:
+            # تعداد واقعی کمتر از total بود - دیگر درخواستی ارسال نشود
+            self.total = len(self.invoices)
+            return
+        start = len(self.invoices)
+        self.beginInsertRows(QModelIndex(), start, start + len(page) - 1)
+        self.invoices.extend(page)
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.invoices)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(INVOICE_HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return INVOICE_HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+
+        invoice = self.invoices[index.row()]
+        column = index.column()
+        if column == 0:
+            return invoice['date']
+        if column == 1:
+            return invoice['tracking_code']
+        if column == 2:
+            return invoice['tariff_type']
+        if column == 3:
+            return f"{invoice['total']:,}"
+        if column == 4:
+            return f"{invoice['patient_pay']:,}"
+        return OPEN_TEXT
+
+
+class ButtonDelegate(QStyledItemDelegate):
+    """کشیدن دکمه در ستون عملیات (بدون ساخت ویجت برای هر ردیف) - متن دکمه = داده خانه"""
+    clicked = pyqtSignal(int)
+
+    def paint(self, painter, option, index):
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(4, 2, -4, -2)
+        button.text = index.data()
+        button.state = QStyle.StateFlag.State_Enabled | QStyle.StateFlag.State_Raised
+        if option.state & QStyle.StateFlag.State_MouseOver:
+            button.state |= QStyle.StateFlag.State_MouseOver
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.Type.MouseButtonRelease
+                and event.button() == Qt.MouseButton.LeftButton
+                and option.rect.contains(event.position().toPoint())):
+            self.clicked.emit(index.row())
+            return True
+        return super().editorEvent(event, model, option, index)
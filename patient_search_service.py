@@ -0,0 +1,104 @@
+"""
+سرویس جستجوی بیماران در پس‌زمینه
+تایپ کاربر با تاخیر کوتاه (debounce) جمع می‌شود، جستجو در یک thread جدا انجام
+می‌شود و فقط نتیجه آخرین عبارت تایپ‌شده به رابط کاربری برمی‌گردد
+"""
+
+import threading
+
+from PyQt6.QtCore import QObject, QThread, QTimer, pyqtSignal
+
+# تاخیر بعد از آخرین کلید تا شروع جستجو
+SEARCH_DELAY_MS = 250
+
+
+class PatientSearchWorker(QThread):
+    """Worker thread ماندگار - همیشه فقط جدیدترین درخواست را اجرا می‌کند"""
+    search_done = pyqtSignal(int, str, list)
+    error = pyqtSignal(str)
+
+    def __init__(self, patient_records):
+        super().__init__()
+        self.patient_records = patient_records
+        self.condition = threading.Condition()
+        self.request = None
+        self.stopping = False
+
+    def submit(self, generation, query):
+        """ثبت درخواست جدید (درخواست اجرانشده قبلی جایگزین می‌شود)"""
+        with self.condition:
+            self.request = (generation, query)
+            self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.request is None and not self.stopping:
+                    self.condition.wait()
+                if self.stopping:
+                    return
+                generation, query = self.request
+                self.request = None
+
+            try:
+                results = self.patient_records.search_by_name(query)
+            except Exception as e:
+                self.error.emit(str(e))
+                continue
+
+            # اگر در این فاصله عبارت جدیدتری رسیده، این نتیجه دیگر لازم نیست
+            with self.condition:
+                stale = self.request is not None or self.stopping
+            if not stale:
+                self.search_done.emit(generation, query, results)
+
+
+class PatientSearchService(QObject):
+    """جستجوی نام بیمار با debounce و لغو نتایج قدیمی"""
+    results_ready = pyqtSignal(str, list)
+
+    def __init__(self, patient_records, delay_ms=SEARCH_DELAY_MS, parent=None):
+        super().__init__(parent)
+        self.generation = 0
+        self.pending_query = ""
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay_ms)
+        self.timer.timeout.connect(self._dispatch)
+
+        self.worker = PatientSearchWorker(patient_records)
+        self.worker.search_done.connect(self._on_search_done)
+        self.worker.error.connect(lambda msg: print(f"⚠️ خطا در جستجوی بیمار: {msg}"))
+        self.worker.start()
+
+    def request(self, query):
+        """درخواست جستجو - بعد از delay_ms بدون کلید جدید اجرا می‌شود"""
+        self.generation += 1
+        self.pending_query = query
+        self.timer.start()
+
+    def cancel(self):
+        """لغو درخواست در انتظار و نادیده گرفتن نتیجه در حال اجرا"""
+        self.generation += 1
+        self.timer.stop()
+
+    def stop(self):
+        """توقف thread (هنگام بستن پنجره)"""
+        self.cancel()
+        if self.worker.isRunning():
+            self.worker.stop()
+            self.worker.wait()
+
+    def _dispatch(self):
+        self.worker.submit(self.generation, self.pending_query)
+
+    def _on_search_done(self, generation, query, results):
+        # نتیجه عبارت‌های قدیمی‌تر از آخرین درخواست نمایش داده نمی‌شود
+        if generation == self.generation:
+            self.results_ready.emit(query, results)
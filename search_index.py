@@ -0,0 +1,105 @@
+"""
+ایندکس جستجوی لیست خدمات
+یک بار بعد از بارگذاری کاتالوگ ساخته می‌شود تا هر کلید تایپ‌شده در جستجو
+بدون پیمایش و نرمال‌سازی دوباره همه ردیف‌ها به مجموعه ردیف‌های منطبق برسد
+"""
+
+from utils import normalize_text
+
+NGRAM = 3
+
+
+class ServiceSearchIndex:
+    """ایندکس جستجو روی شرح و کد خدمات"""
+
+    def __init__(self, codes, names, category_index=None):
+        """
+        Args:
+            codes: لیست کدملی خدمات (ردیف i کاتالوگ)
+            names: لیست شرح خدمات (ردیف i کاتالوگ)
+            category_index: دیکشنری دسته -> مجموعه ردیف‌ها (CategoryFilter.build_category_index)
+        """
+        self.size = len(names)
+        self.all_rows = frozenset(range(self.size))
+        self.category_index = category_index or {}
+
+        # ایندکس مستقیم: کدملی -> ردیف و شرح -> ردیف‌ها (یک شرح ممکن است چند کد داشته باشد)
+        self.code_rows = {}
+        self.name_rows = {}
+        for row, (code, name) in enumerate(zip(codes, names)):
+            if code:
+                self.code_rows.setdefault(code, row)
+            self.name_rows.setdefault(name, []).append(row)
+
+        # متن‌های از پیش نرمال‌شده
+        self.norm_codes = [normalize_text(c) for c in codes]
+        self.norm_names = [normalize_text(n) for n in names]
+
+        # trie پسوندهای کد: هر زیررشته کد، پیشوند یکی از پسوندهای آن است
+        self.code_trie = {}
+        for row, code in enumerate(self.norm_codes):
+            for start in range(len(code)):
+                node = self.code_trie
+                for ch in code[start:]:
+                    node = node.setdefault(ch, {})
+                    node.setdefault("", set()).add(row)
+
+        # ایندکس معکوس n-gram روی شرح خدمات
+        self.name_ngrams = {}
+        for row, name in enumerate(self.norm_names):
+            for gram in {name[i:i + NGRAM] for i in range(len(name) - NGRAM + 1)}:
+                self.name_ngrams.setdefault(gram, set()).add(row)
+
+    def match_code(self, query):
+        """ردیف‌هایی که کدشان شامل query است (query نرمال‌شده)"""
+        node = self.code_trie
+        for ch in query:
+            node = node.get(ch)
+            if node is None:
+                return set()
+        return node.get("", set())
+
+    def match_name(self, query):
+        """ردیف‌هایی که شرحشان شامل query است (query نرمال‌شده)"""
+        if len(query) < NGRAM:
+            # عبارت کوتاه: پیمایش متن‌های از پیش نرمال‌شده کافی است
+            return {row for row, name in enumerate(self.norm_names) if query in name}
+
+        postings = []
+        for i in range(len(query) - NGRAM + 1):
+            rows = self.name_ngrams.get(query[i:i + NGRAM])
+            if not rows:
+                return set()
+            postings.append(rows)
+
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        if len(postings) == 1:
+            return set(candidates)
+
+        # ترتیب n-gramها در ایندکس حفظ نمی‌شود؛ بررسی نهایی روی کاندیداها
+        return {row for row in candidates if query in self.norm_names[row]}
+
+    def row_for_code(self, code):
+        """ردیف کاتالوگ برای یک کدملی (یا None)"""
+        return self.code_rows.get(code)
+
+    def rows_for_name(self, name):
+        """همه ردیف‌های کاتالوگ با این شرح"""
+        return self.name_rows.get(name, [])
+
+    def rows_in_category(self, category):
+        """مجموعه ردیف‌های یک دسته (دسته ناشناخته = همه ردیف‌ها)"""
+        return self.category_index.get(category, self.all_rows)
+
+    def search(self, text):
+        """
+        جستجوی متن در شرح یا کد خدمات
+
+        Returns:
+            مجموعه شماره ردیف‌های منطبق، یا None اگر عبارت جستجو خالی باشد (همه ردیف‌ها)
+        """
+        query = normalize_text(text)
+        if not query:
+            return None
+        return self.match_code(query) | self.match_name(query)
@@ -0,0 +1,130 @@
+"""
+مدل لیست خدمات (Model/View)
+به‌جای ساختن یک QListWidgetItem برای هر ردیف تعرفه، متن هر ردیف فقط هنگام
+نمایش از روی آرایه‌های ستونی کاتالوگ ساخته می‌شود
+"""
+
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex
+from PyQt6.QtGui import QFont, QColor
+
+HEADER_TEXT = "📋 لیست خدمات (Shift+Click = چندتایی)"
+LOADING_TEXT = "⏳ در حال بارگذاری لیست خدمات..."
+
+# نقش داده برای شماره ردیف کاتالوگ (برای افزودن خدمت بدون جستجوی متن)
+ROW_ID_ROLE = Qt.ItemDataRole.UserRole
+
+
+class ServiceListModel(QAbstractListModel):
+    """مدل لیست خدمات - ردیف 0 عنوان لیست است و ردیف i+1 ردیف i کاتالوگ"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.codes = []
+        self.names = []
+        self.prices = None  # آرایه قیمت هر ردیف برای نوع تعرفه فعلی
+        self.header_text = HEADER_TEXT
+        self.header_font = QFont("Vazirmatn", 12, QFont.Weight.Bold)
+        self.header_background = QColor("#0077b6")
+        self.header_foreground = QColor("#ffffff")
+
+    # ---------- داده ----------
+
+    def set_catalog(self, codes, names):
+        """جایگزینی کل کاتالوگ (O(1) برای view؛ ردیف‌ها هنگام نمایش ساخته می‌شوند)"""
+        if codes == self.codes and names == self.names:
+            # همان ردیف‌هایی که تکه‌تکه اضافه شده‌اند - انتخاب و اسکرول کاربر حفظ می‌شود
+            self.codes = codes
+            self.names = names
+            return
+        self.beginResetModel()
+        self.codes = codes
+        self.names = names
+        self.endResetModel()
+
+    def append_rows(self, codes, names):
+        """افزودن یک تکه ردیف به انتهای لیست (بارگذاری تدریجی)"""
+        if not names:
+            return
+        first = len(self.names) + 1
+        self.beginInsertRows(QModelIndex(), first, first + len(names) - 1)
+        self.codes = self.codes + codes
+        self.names = self.names + names
+        self.endInsertRows()
+
+    def clear(self):
+        """خالی کردن لیست (فقط سطر عنوان می‌ماند)"""
+        self.set_catalog([], [])
+
+    def set_prices(self, prices):
+        """تنظیم آرایه قیمت ردیف‌ها (یا None برای نمایش بدون قیمت)"""
+        self.prices = prices
+        if self.names:
+            self.dataChanged.emit(self.index(1, 0), self.index(len(self.names), 0))
+
+    def catalog_size(self):
+        """تعداد ردیف‌های کاتالوگ (بدون سطر عنوان)"""
+        return len(self.names)
+
+    def display_text(self, row):
+        """متن نمایشی ردیف row از کاتالوگ"""
+        code = self.codes[row]
+        name = self.names[row]
+        return f"{code} - {name}" if code else name
+
+    # ---------- سطر عنوان ----------
+
+    def set_header_text(self, text):
+        """تغییر متن سطر عنوان (مثلاً حالت در حال بارگذاری)"""
+        self.header_text = text
+        self._header_changed()
+
+    def set_header_style(self, font=None, background=None, foreground=None):
+        """تنظیم فونت و رنگ سطر عنوان"""
+        if font is not None:
+            self.header_font = font
+        if background is not None:
+            self.header_background = background
+        if foreground is not None:
+            self.header_foreground = foreground
+        self._header_changed()
+
+    def _header_changed(self):
+        index = self.index(0, 0)
+        self.dataChanged.emit(index, index)
+
+    # ---------- رابط QAbstractListModel ----------
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.names) + 1
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+
+        row = index.row()
+        if row == 0:
+            if role == Qt.ItemDataRole.DisplayRole:
+                return self.header_text
+            if role == Qt.ItemDataRole.FontRole:
+                return self.header_font
+            if role == Qt.ItemDataRole.BackgroundRole:
+                return self.header_background
+            if role == Qt.ItemDataRole.ForegroundRole:
+                return self.header_foreground
+            return None
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            text = self.display_text(row - 1)
+            if self.prices is not None:
+                text = f"{text}  |  {int(self.prices[row - 1]):,} ریال"
+            return text
+        if role == ROW_ID_ROLE:
+            return row - 1
+        return None
+
+    def flags(self, index):
+        if not index.isValid() or index.row() == 0:
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemNeverHasChildren
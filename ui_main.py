@@ -4,12 +4,11 @@
 """
 
 import os
-import pandas as pd
 import jdatetime
 import json
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QLabel, QListWidget, QPushButton,
-    QMessageBox, QListWidgetItem, QComboBox, QLineEdit, QHBoxLayout,
+    QWidget, QVBoxLayout, QLabel, QListView, QPushButton,
+    QMessageBox, QComboBox, QLineEdit, QHBoxLayout,
     QTableWidget, QTableWidgetItem, QSpinBox, QScrollArea, QFrame,
     QCheckBox
 )
@@ -18,30 +17,30 @@ from PyQt6.QtCore import Qt
 
 from ui_settings import SettingsDialog
 from utils import resource_path
-from invoice import generate_invoice, direct_print
+from invoice import direct_print, invoice_from_app, invoice_save_dir
+from invoice_service import InvoiceSaveService
 from utils import int_from_string
 from features import FeatureManager
 from history import HistoryDialog
 from shortcuts import ShortcutManager
 from category_filter import CategoryFilter
-from calculator import PriceCalculator
+from calculator import PriceCalculator, PriceTableCache
+from catalog_cache import CatalogCache, CODE_COL, FEATURE_COL, NAME_COL, PROF_COL, TECH_COL
+from catalog_loader import CatalogLoadWorker, prepare_catalog
+from service_model import ServiceListModel, HEADER_TEXT, LOADING_TEXT, ROW_ID_ROLE
 
 # ⭐ Import ماژولهای سوابق بیمار + جستجو
 try:
     from patient_records import PatientRecordsManager
     from ui_patient_history import PatientHistoryDialog
     from ui_patient_search import PatientSearchDialog
+    from patient_search_service import PatientSearchService
     PATIENT_RECORDS_AVAILABLE = True
 except ImportError:
     PATIENT_RECORDS_AVAILABLE = False
     print("⚠️ ماژول سوابق بیماران یافت نشد. لطفاً patient_records.py، ui_patient_history.py و ui_patient_search.py را ایجاد کنید.")
 
 
-def normalize_text(txt):
-    """نرمالسازی متن فارسی"""
-    return txt.replace("ي", "ی").replace("ك", "ک").strip().lower()
-
-
 class InsuranceApp(QWidget):
     """برنامه اصلی تعرفه و فاکتور"""
 
@@ -61,6 +60,9 @@ class InsuranceApp(QWidget):
         self.phone = "07132655"
         self.doctor_name = "شهسواری رضا"
         self.font_size = 10
+        self.background_load = True  # بارگذاری کاتالوگ در پس‌زمینه
+        self.records_backend = "json"  # ذخیره سوابق بیماران: json یا sqlite یا sharded
+        self.records_shared = False  # سوابق JSON در پوشه مشترک چند کامپیوتر (قفل فایل + ادغام)
         self.setFont(QFont("Vazirmatn", self.font_size))
 
         # بارگذاری تنظیمات از فایل
@@ -79,10 +81,23 @@ class InsuranceApp(QWidget):
         # دیکشنری نگهداری کد -> خدمت
         self.service_codes = {}
 
-        # بارگذاری داده
-        self.load_excel()
+        # کش ستونی کاتالوگ (کنار فایل تنظیمات)
+        self.catalog_cache = CatalogCache()
+        self.catalog_worker = None
+        self.retired_catalog_workers = set()  # workerهای متوقف‌شده تا پایان thread
+        self.df = None
+        self.name_col = NAME_COL
+
+        # ایندکس جستجو + ردیفهای مخفی فعلی لیست خدمات
+        self.search_index = None
+        self.hidden_rows = set()
+
+        # جدول قیمت همه خدمات برای نوع تعرفه فعلی (محاسبه برداری)
+        # + کش جدولها به ازای هر مجموعه ضرایب کای و بیحسی
+        self.price_cache = PriceTableCache()
+        self.price_table = None
 
-        # ساخت رابط
+        # ساخت رابط (لیست خدمات بعد از بارگذاری کاتالوگ پر میشود)
         self.init_ui()
 
         # میانبرها
@@ -90,15 +105,45 @@ class InsuranceApp(QWidget):
 
         # ⭐ مدیریت سوابق بیماران
         if PATIENT_RECORDS_AVAILABLE:
-            self.patient_records = PatientRecordsManager()
+            self.patient_records = self.create_patient_records()
+            # پیشنهاد بیمار هنگام تایپ نام (جستجو در پسزمینه)
+            self.name_search = PatientSearchService(self.patient_records, parent=self)
+            self.name_search.results_ready.connect(self.on_name_suggestions)
             # میانبر Ctrl+F برای جستجو
             QShortcut(QKeySequence("Ctrl+F"), self, self.open_patient_search)
         else:
             self.patient_records = None
+            self.name_search = None
+
+        # صف ذخیره فاکتور (رندر PDF، سوابق و تاریخچه در پسزمینه)
+        self.invoice_saver = InvoiceSaveService(self.patient_records, self.features, parent=self)
+        self.invoice_saver.saved.connect(self.on_invoice_saved)
+        self.invoice_saver.failed.connect(self.on_invoice_failed)
+        self.invoice_saver.pending_changed.connect(self.on_invoice_queue_changed)
+        self.pending_prints = set()  # شماره کارهای ذخیرهای که بعد از پایان چاپ میشوند
+
+        # بارگذاری داده (در حالت پسزمینه، پنجره منتظر اکسل نمیماند)
+        self.reload_catalog()
 
         # تم
         self.apply_colors()
 
+    def create_patient_records(self):
+        """ساخت مدیریت سوابق بیماران بر اساس تنظیم records_backend"""
+        if self.records_backend == "sqlite":
+            try:
+                from patient_records_sqlite import SQLitePatientRecordsManager
+                return SQLitePatientRecordsManager()
+            except Exception as e:
+                print(f"⚠️ خطا در باز کردن سوابق SQLite، استفاده از JSON: {e}")
+        elif self.records_backend == "sharded":
+            try:
+                from patient_records_sharded import ShardedPatientRecordsManager
+                return ShardedPatientRecordsManager()
+            except Exception as e:
+                print(f"⚠️ خطا در باز کردن سوابق تکه‌تکه، استفاده از JSON: {e}")
+        return PatientRecordsManager(shared=self.records_shared)
+
     def load_settings(self):
         """بارگذاری تنظیمات از فایل JSON"""
         try:
@@ -112,6 +157,9 @@ class InsuranceApp(QWidget):
                     self.logo_path = settings.get('logo_path', self.logo_path)
                     self.font_size = settings.get('font_size', self.font_size)
                     self.excel_path = settings.get('excel_path', self.excel_path)
+                    self.background_load = settings.get('background_load', self.background_load)
+                    self.records_backend = settings.get('records_backend', self.records_backend)
+                    self.records_shared = settings.get('records_shared', self.records_shared)
         except Exception as e:
             print(f"خطا در بارگذاری تنظیمات: {e}")
 
@@ -125,7 +173,10 @@ class InsuranceApp(QWidget):
                 'doctor_name': self.doctor_name,
                 'logo_path': self.logo_path,
                 'font_size': self.font_size,
-                'excel_path': self.excel_path
+                'excel_path': self.excel_path,
+                'background_load': self.background_load,
+                'records_backend': self.records_backend,
+                'records_shared': self.records_shared
             }
             with open('app_settings.json', 'w', encoding='utf-8') as f:
                 json.dump(settings, f, ensure_ascii=False, indent=2)
@@ -202,8 +253,9 @@ class InsuranceApp(QWidget):
 
         top.addWidget(QLabel("🔍"))
         self.search = QLineEdit()
-        self.search.setPlaceholderText("جستجو با نام یا کد (مثلا: 701500)")
+        self.search.setPlaceholderText("جستجو با نام یا کد (مثلا: 701500 + Enter)")
         self.search.textChanged.connect(self.filter_list)
+        self.search.returnPressed.connect(self.add_service_by_code)
         top.addWidget(self.search)
 
         # ⭐ دکمه جستجوی بیمار با نام
@@ -308,66 +360,76 @@ class InsuranceApp(QWidget):
         self.apply_filters()
 
     def apply_filters(self):
-        """اعمال فیلتر دسته بندی + جستجو با کد"""
-        search_text = normalize_text(self.search.text())
-
-        for i in range(1, self.service_list.count()):
-            item = self.service_list.item(i)
-            full_text = item.text()
-
-            if " - " in full_text:
-                service_name = full_text.split(" - ", 1)[1]
-                service_code = full_text.split(" - ", 1)[0]
-            else:
-                service_name = full_text
-                service_code = ""
+        """اعمال فیلتر دسته بندی + جستجو با کد (فقط تغییرات نمایش به لیست ارسال میشود)"""
+        if self.search_index is None:
+            return
 
-            item_category = self.category_filter.categorize_service(full_text)
-            category_match = (self.current_category == "همه" or item_category == self.current_category)
+        # ردیفهای منطبق با جستجو از روی ایندکس
+        visible = self.search_index.search(self.search.text())
+        if visible is None:
+            visible = self.search_index.all_rows
 
-            search_match = (
-                not search_text or
-                search_text in normalize_text(service_name) or
-                search_text in normalize_text(service_code)
-            )
+        # دسته هر خدمت هنگام بارگذاری محاسبه شده؛ فیلتر دسته = یک اشتراک مجموعه
+        if self.current_category != "همه":
+            visible = visible & self.search_index.rows_in_category(self.current_category)
 
-            item.setHidden(not (category_match and search_match))
+        hidden = self.search_index.all_rows - visible
+        for row in hidden ^ self.hidden_rows:
+            self.service_list.setRowHidden(row + 1, row in hidden)
+        self.hidden_rows = hidden
 
     def filter_list(self, text):
         """جستجو با در نظر گرفتن دسته بندی"""
         self.apply_filters()
 
     def create_service_list(self):
-        """ساخت لیست خدمات با کد"""
-        service_list = QListWidget()
+        """ساخت لیست خدمات با کد (مدل/نما - ردیفها هنگام نمایش ساخته میشوند)"""
+        self.service_model = ServiceListModel(self)
+        self.service_model.set_header_style(font=QFont("Vazirmatn", self.font_size + 2, QFont.Weight.Bold))
+
+        service_list = QListView()
+        service_list.setModel(self.service_model)
         service_list.setFont(QFont("Vazirmatn", self.font_size))
         service_list.setSpacing(0)
-        service_list.setSelectionMode(QListWidget.SelectionMode.ExtendedSelection)
+        service_list.setUniformItemSizes(True)
+        service_list.setSelectionMode(QListView.SelectionMode.ExtendedSelection)
+        return service_list
 
-        self.header_item = QListWidgetItem("📋 لیست خدمات (Shift+Click = چندتایی)")
-        self.header_item.setFlags(
-            self.header_item.flags() & ~Qt.ItemFlag.ItemIsSelectable & ~Qt.ItemFlag.ItemIsEnabled
+    def show_catalog(self, df, search_index=None):
+        """نمایش کاتالوگ در لیست خدمات (بدون ساخت آیتم برای هر ردیف)"""
+        codes = df[CODE_COL].tolist()
+        names = df[self.name_col].tolist()
+        self.service_codes = {code: name for code, name in zip(codes, names) if code}
+        self.search_index = search_index or prepare_catalog(df, self.category_filter)
+        self.hidden_rows = set()
+        self.service_model.set_catalog(codes, names)
+        self.price_cache.set_catalog(
+            df[PROF_COL].to_numpy(),
+            df[TECH_COL].to_numpy(),
+            PriceCalculator.hash_mask(df[FEATURE_COL])
         )
-        header_font = QFont("Vazirmatn", self.font_size + 2, QFont.Weight.Bold)
-        self.header_item.setFont(header_font)
-        service_list.addItem(self.header_item)
-
-        for idx, row in self.df.iterrows():
-            service_name = str(row[self.name_col])
-            if not service_name or service_name == 'nan':
-                continue
-
-            service_code = str(row.get('کدملی', ''))
-            if service_code and service_code != 'nan' and service_code != '':
-                service_code = service_code.replace('.0', '').strip()
-                display_text = f"{service_code} - {service_name}"
-                self.service_codes[service_code] = service_name
-            else:
-                display_text = service_name
+        self.refresh_price_table()
+
+        # اعمال فیلتر فعلی روی لیست جدید
+        if self.search.text() or self.current_category != "همه":
+            self.apply_filters()
+
+    def refresh_price_table(self):
+        """جدول قیمت همه خدمات برای ضرایب، نوع تعرفه و بیحسی فعلی + نمایش در لیست"""
+        prices = self.price_cache.get(self.calculator, self.anesthesia_checkbox.isChecked())
+        if prices is None or self.service_model.catalog_size() != len(prices['private']):
+            self.price_table = None
+            self.service_model.set_prices(None)
+            return
 
-            service_list.addItem(QListWidgetItem(display_text))
+        # جایگزینی یکجا: جدول جدید کامل ساخته شده و بعد جای قبلی را میگیرد
+        self.price_table = PriceCalculator.tariff_columns(prices, self.type_combo.currentText())
+        self.service_model.set_prices(self.price_table['total'])
 
-        return service_list
+    def set_coefficients(self, coefficients):
+        """جایگزینی ضرایب کای و بهروزرسانی قیمتها"""
+        self.calculator = PriceCalculator(coefficients)
+        self.refresh_price_table()
 
     def create_tariff_row(self):
         """ساخت ردیف نوع تعرفه + بیحسی موضعی"""
@@ -377,12 +439,14 @@ class InsuranceApp(QWidget):
         row.addWidget(QLabel("👤 نوع تعرفه:"))
         self.type_combo = QComboBox()
         self.type_combo.addItems(["بیمه شده", "خصوصی آزاد", "دولتی"])
+        self.type_combo.currentTextChanged.connect(self.refresh_price_table)
         row.addWidget(self.type_combo)
 
         # چکباکس بیحسی موضعی
         self.anesthesia_checkbox = QCheckBox("💉 بی حسی موضعی (+20%)")
         self.anesthesia_checkbox.setStyleSheet("font-weight: bold; color: #d32f2f;")
         self.anesthesia_checkbox.stateChanged.connect(self.calculate)
+        self.anesthesia_checkbox.stateChanged.connect(self.refresh_price_table)
         row.addWidget(self.anesthesia_checkbox)
 
         btn_add = QPushButton("➕ افزودن")
@@ -544,6 +608,93 @@ class InsuranceApp(QWidget):
 
     # ============ متدهای عملیاتی ============
 
+    def reload_catalog(self):
+        """بارگذاری (یا بارگذاری مجدد) کاتالوگ و پر کردن لیست خدمات"""
+        self.stop_catalog_worker()
+        self.search_index = None
+        self.hidden_rows = set()
+        self.service_model.clear()
+        self.service_codes.clear()
+
+        if not self.background_load:
+            self.load_excel()
+            if self.df is not None:
+                self.show_catalog(self.df)
+            return
+
+        if not os.path.exists(self.excel_path):
+            QMessageBox.critical(self, "خطا", f"فایل اکسل یافت نشد:\n{self.excel_path}")
+            return
+
+        self.service_model.set_header_text(LOADING_TEXT)
+        worker = CatalogLoadWorker(self.catalog_cache, self.excel_path, self.category_filter)
+        worker.rows_ready.connect(self.on_catalog_rows)
+        worker.catalog_ready.connect(self.on_catalog_ready)
+        worker.error.connect(self.on_catalog_error)
+        self.catalog_worker = worker
+        worker.start()
+
+    def stop_catalog_worker(self, wait=False):
+        """
+        توقف بارگذاری در حال اجرا (مثلاً هنگام تغییر فایل اکسل)
+
+        رابط منتظر نمی‌ماند: سیگنال‌های worker قطع می‌شوند و thread در پس‌زمینه تمام
+        می‌شود. فقط هنگام بستن برنامه (wait=True) منتظر پایان همه workerها می‌ماند.
+        """
+        worker = self.catalog_worker
+        self.catalog_worker = None
+        if worker is not None and worker.isRunning():
+            worker.requestInterruption()
+            worker.rows_ready.disconnect(self.on_catalog_rows)
+            worker.catalog_ready.disconnect(self.on_catalog_ready)
+            worker.error.disconnect(self.on_catalog_error)
+            # نگه داشتن worker تا پایان thread (حذف QThread در حال اجرا برنامه را می‌بندد)
+            self.retired_catalog_workers.add(worker)
+            worker.finished.connect(lambda w=worker: self.retired_catalog_workers.discard(w))
+            if worker.isFinished():
+                self.retired_catalog_workers.discard(worker)
+        if wait:
+            for retired in list(self.retired_catalog_workers):
+                retired.wait()
+            self.retired_catalog_workers.clear()
+
+    def is_stale_catalog_signal(self):
+        """سیگنال از workerی آمده که دیگر فعال نیست؟"""
+        sender = self.sender()
+        return isinstance(sender, CatalogLoadWorker) and sender is not self.catalog_worker
+
+    def on_catalog_rows(self, codes, names):
+        """یک تکه از ردیف‌های اکسل خوانده شد - نمایش در لیست (جستجو بعد از ساخت ایندکس)"""
+        if self.is_stale_catalog_signal():
+            return
+        self.service_model.append_rows(codes, names)
+
+    def on_catalog_ready(self, df, search_index):
+        """کاتالوگ خوانده شد - لیست، جستجو و add_service از این لحظه قابل استفاده است"""
+        if self.is_stale_catalog_signal():
+            return
+        self.df = df
+        self.name_col = NAME_COL
+        self.service_model.set_header_text(HEADER_TEXT)
+        self.show_catalog(df, search_index)
+
+    def on_catalog_error(self, message):
+        """خطا در بارگذاری پسزمینه"""
+        if self.is_stale_catalog_signal():
+            return
+        self.service_model.set_header_text(HEADER_TEXT)
+        QMessageBox.critical(self, "خطا در بارگذاری اکسل", f"❌ خطا:\n{message}")
+
+    def closeEvent(self, event):
+        """بستن پنجره - منتظر پایان thread بارگذاری، صف ذخیره فاکتور و ادغام سوابق"""
+        self.stop_catalog_worker(wait=True)
+        self.invoice_saver.wait()
+        if self.name_search:
+            self.name_search.stop()
+        if self.patient_records:
+            self.patient_records.close()
+        super().closeEvent(event)
+
     def load_excel(self):
         """بارگذاری اکسل - نسخه جدید برای all.xlsx"""
         try:
@@ -551,88 +702,60 @@ class InsuranceApp(QWidget):
                 QMessageBox.critical(self, "خطا", f"فایل اکسل یافت نشد:\n{self.excel_path}")
                 return
 
-            df = pd.read_excel(self.excel_path)
-
-            # تشخیص اینکه آیا فایل all.xlsx است یا ghardash.xlsx
-            if 'Unnamed: 0' in df.columns:
-                # فایل all.xlsx - نیاز به تنظیم هدرها
-                df.columns = ['کدملی', 'ویژگی کد', 'شرح کد', 'توضیحات', 'کل', 'حرفهای', 'فنی', 'ارزش پایه بیهوشی']
-                df = df.iloc[2:].reset_index(drop=True)  # حذف دو سطر اول
-                df = df.dropna(subset=['کدملی'])
-                self.name_col = 'شرح کد'
-            else:
-                # فایل ghardash.xlsx - ساختار قدیمی
-                self.name_col = [c for c in df.columns if "شرح" in str(c)][0]
-
-            self.df = df.fillna("")
+            # کاتالوگ نرمال‌شده (all.xlsx یا ghardash.xlsx) - از کش در صورت معتبر بودن
+            self.df = self.catalog_cache.load(self.excel_path)
+            self.name_col = NAME_COL
 
         except Exception as e:
             QMessageBox.critical(self, "خطا در بارگذاری اکسل", f"❌ خطا:\n{str(e)}")
 
     def add_service(self):
-        """افزودن خدمت - با احتساب بیحسی موضعی"""
-        selected = self.service_list.selectedItems()
-        if not selected:
+        """افزودن خدمات انتخاب شده - با احتساب بیحسی موضعی"""
+        selected = self.service_list.selectionModel().selectedRows()
+        if not selected or self.df is None:
             return
 
-        for s in selected:
-            full_text = s.text()
-            if " - " in full_text:
-                name = full_text.split(" - ", 1)[1]
-            else:
-                name = full_text
+        for index in selected:
+            row = index.data(ROW_ID_ROLE)
+            if row is not None and not self.add_service_row(row):
+                break
 
-            row = self.df[self.df[self.name_col].astype(str) == name]
-            if row.empty:
-                continue
+        self.calculate()
 
-            # دریافت نوع خدمت و ضرایب
-            service_type = str(row.iloc[0].get('ویژگی کد', ''))
+    def add_service_by_code(self):
+        """افزودن مستقیم خدمت با تایپ کدملی کامل در جستجو + Enter"""
+        if self.search_index is None or self.df is None:
+            return
 
-            # تلاش برای دریافت مقادیر حرفهای و فنی
-            prof_value = 0
-            tech_value = 0
-            try:
-                prof_value = float(row.iloc[0].get('حرفهای', 0))
-            except:
-                pass
-            try:
-                tech_value = float(row.iloc[0].get('فنی', 0))
-            except:
-                pass
-
-            # محاسبه قیمتها با calculator
-            prices = self.calculator.calculate_service_price(service_type, prof_value, tech_value)
-
-            # ⭐ اعمال بیحسی موضعی
-            if self.anesthesia_checkbox.isChecked():
-                # خصوصی آزاد جدید = خصوصی قدیمی × 1.20
-                prices['private'] = int(prices['private'] * 1.20)
-                # بیمه شده جدید = خصوصی جدید - سهم سازمان (سازمان ثابت)
-                prices['insurance'] = prices['private'] - prices['organization']
-
-            ttype = self.type_combo.currentText()
-            if ttype == "خصوصی آزاد":
-                total = prices['private']
-                org = 0
-                patient = total
-            elif ttype == "دولتی":
-                total = prices['government']
-                org = 0
-                patient = total
-            else:  # بیمهشده
-                total = prices['private']
-                org = prices['organization']
-                patient = prices['insurance']
-
-            # افزودن به جدول
-            r = self.table.rowCount()
-            self.table.insertRow(r)
-            for j, val in enumerate([name, ttype, str(int(total)), str(int(org)), str(int(patient)), ""]):
-                self.table.setItem(r, j, QTableWidgetItem(val))
+        row = self.search_index.row_for_code(self.search.text().strip())
+        if row is None:
+            return
 
+        self.add_service_row(row)
         self.calculate()
 
+    def add_service_row(self, row):
+        """افزودن ردیف row کاتالوگ به جدول (بدون محاسبه مجدد جمع) - False اگر قیمتها آماده نباشد"""
+        name = self.df[self.name_col].iat[row]
+        ttype = self.type_combo.currentText()
+
+        # قیمتها از جدول برداری (بیحسی موضعی و نوع تعرفه در آن اعمال شده)
+        if self.price_table is None:
+            self.refresh_price_table()
+        if self.price_table is None:
+            QMessageBox.warning(self, "خطا", "⚠️ قیمت خدمات هنوز محاسبه نشده است!")
+            return False
+        total = self.price_table['total'][row]
+        org = self.price_table['organization'][row]
+        patient = self.price_table['patient'][row]
+
+        # افزودن به جدول
+        r = self.table.rowCount()
+        self.table.insertRow(r)
+        for j, val in enumerate([name, ttype, str(int(total)), str(int(org)), str(int(patient)), ""]):
+            self.table.setItem(r, j, QTableWidgetItem(val))
+        return True
+
     def add_misc_cost(self):
         """افزودن هزینه متفرقه به جدول"""
         title = self.misc_title_input.text().strip()
@@ -709,27 +832,31 @@ class InsuranceApp(QWidget):
 
     def suggest_patients_by_name(self):
         """نمایش پیام اگر بیماری با نام مشابه وجود دارد"""
-        if not PATIENT_RECORDS_AVAILABLE or not self.patient_records:
+        if not PATIENT_RECORDS_AVAILABLE or not getattr(self, 'name_search', None):
             return
         
         name_text = self.name_in.text().strip()
         
         # فقط اگر بیشتر از 3 حرف تایپ شده و کدملی خالی است
         if len(name_text) >= 3 and not self.national_code_in.text().strip():
-            results = self.patient_records.search_by_name(name_text)
-            
-            if results and len(results) > 0:
-                # تغییر رنگ فیلد نام به نارنجی (هشدار)
-                self.name_in.setStyleSheet("""
-                    background-color: #fff3e0; 
-                    border: 2px solid #ff9800; 
-                    padding: 10px; 
-                    border-radius: 8px;
-                """)
-            else:
-                # بازگشت به حالت عادی
-                self.name_in.setStyleSheet("")
+            # جستجو در پسزمینه؛ نتیجه با on_name_suggestions میرسد
+            self.name_search.request(name_text)
         else:
+            self.name_search.cancel()
+            self.name_in.setStyleSheet("")
+
+    def on_name_suggestions(self, query, results):
+        """نتیجه جستجوی نام تایپشده"""
+        if results:
+            # تغییر رنگ فیلد نام به نارنجی (هشدار)
+            self.name_in.setStyleSheet("""
+                background-color: #fff3e0; 
+                border: 2px solid #ff9800; 
+                padding: 10px; 
+                border-radius: 8px;
+            """)
+        else:
+            # بازگشت به حالت عادی
             self.name_in.setStyleSheet("")
 
     def open_patient_search(self):
@@ -833,7 +960,7 @@ class InsuranceApp(QWidget):
             QMessageBox.warning(self, "خطا", "⚠️ لطفاً کدملی را وارد کنید!")
             return
 
-        summary = self.patient_records.get_patient_summary(national_code)
+        summary = self.patient_records.get_patient_summary(national_code, include_invoices=False)
 
         if not summary:
             QMessageBox.information(
@@ -843,90 +970,51 @@ class InsuranceApp(QWidget):
             )
             return
 
-        dialog = PatientHistoryDialog(self, summary)
+        # فاکتورها صفحهبهصفحه از مدیریت سوابق خوانده میشوند
+        dialog = PatientHistoryDialog(self, summary, self.patient_records)
         dialog.exec()
 
     # ⭐ ============ ذخیره فاکتور با ثبت سوابق ============
 
     def save_invoice(self):
-        """ذخیره فاکتور + ثبت در سوابق بیمار"""
-        path = generate_invoice(self)
-
-        if path:
-            # محاسبه مقادیر
-            total = org = patient = 0
-            services_list = []
-
-            for i in range(self.table.rowCount()):
-                service_name = self.table.item(i, 0).text()
-                tariff_type = self.table.item(i, 1).text()
-                cost = int(self.table.item(i, 2).text().replace(',', ''))
-
-                total += cost
-                org += int(self.table.item(i, 3).text().replace(',', ''))
-                patient += int(self.table.item(i, 4).text().replace(',', ''))
-
-                services_list.append({
-                    'name': service_name,
-                    'tariff': tariff_type,
-                    'cost': cost
-                })
-
-            # اعمال تخفیف
-            discount_value = self.discount_spin.value()
-            discount_type = self.discount_type.currentText()
-            discount_amount = 0
-
-            if discount_value > 0:
-                if discount_type == "درصدی":
-                    discount_amount = int(total * discount_value / 100)
-                else:
-                    discount_amount = discount_value
-
-                patient = max(0, patient - discount_amount)
-                total = max(0, total - discount_amount)
-
-            # ⭐ ثبت در سوابق بیمار
-            national_code = self.national_code_in.text().strip()
-
-            if national_code and PATIENT_RECORDS_AVAILABLE and self.patient_records:
-                patient_data = {
-                    'name': self.name_in.text().strip(),
-                    'insurance': self.ins_in.text().strip(),
-                    'tracking_code': self.tracking_code_in.text().strip(),
-                    'services': services_list,
-                    'total': total,
-                    'organization': org,
-                    'patient_pay': patient,
-                    'discount': discount_amount,
-                    'tariff_type': self.type_combo.currentText(),
-                    'pdf_path': path
-                }
-
-                if self.patient_records.add_record(national_code, patient_data):
-                    print(f"✅ سوابق بیمار {national_code} ذخیره شد")
+        """
+        ذخیره فاکتور + ثبت در سوابق بیمار (در پسزمینه)
 
-            # ذخیره در تاریخچه (کد قبلی)
-            name_part = self.name_in.text().strip() or "بیمار"
-            national_part = national_code or ""
-            tracking_part = self.tracking_code_in.text().strip() or ""
-
-            filename_parts = [name_part]
-            if national_part:
-                filename_parts.append(national_part)
-            if tracking_part:
-                filename_parts.append(tracking_part)
-
-            filename = "_".join(filename_parts)
-            self.features.save_to_history(path, filename)
-            self.stats_label.setText(f"📊 فاکتورهای امروز: {self.features.get_today_stats()}")
+        Returns:
+            int شماره کار ذخیره (در on_invoice_saved برمیگردد) یا None
+        """
+        try:
+            invoice = invoice_from_app(self)
+        except Exception as e:
+            QMessageBox.warning(self, "خطا", f"⚠️ خطا در خواندن اطلاعات فاکتور:\n{e}")
+            return None
+        # فرم بلافاصله آزاد است؛ رندر، فایلها و سوابق در صف ذخیره نوشته میشوند
+        return self.invoice_saver.submit(invoice, invoice_save_dir(self))
+
+    def on_invoice_saved(self, ticket, artifact):
+        """پایان ذخیره یک فاکتور - چاپ در صورت درخواست"""
+        if ticket in self.pending_prints:
+            self.pending_prints.discard(ticket)
+            direct_print(self, artifact)
+
+    def on_invoice_failed(self, ticket, message):
+        self.pending_prints.discard(ticket)
+        print(f"⚠️ خطا در ذخیره فاکتور: {message}")
+        QMessageBox.warning(self, "خطا", f"⚠️ خطا در ذخیره فاکتور:\n{message}")
+
+    def on_invoice_queue_changed(self, pending):
+        """نمایش تعداد فاکتورهای در حال ذخیره کنار آمار امروز"""
+        text = f"📊 فاکتورهای امروز: {self.features.get_today_stats()}"
+        if pending:
+            text += f"  ⏳ در حال ذخیره: {pending}"
+        self.stats_label.setText(text)
 
     def print_invoice(self):
         """چاپ فاکتور + ذخیره سوابق"""
-        # ابتدا ذخیره کن (که سوابق هم ثبت بشه)
-        self.save_invoice()
-        # بعد چاپ کن
-        direct_print(self)
+        # ابتدا ذخیره کن (که سوابق هم ثبت بشه) و بعد از پایان ذخیره همان فاکتور را چاپ کن
+        ticket = self.save_invoice()
+        if ticket is not None:
+            self.pending_prints.add(ticket)
 
     def clear_all(self):
         """پاک کردن همه"""
@@ -976,7 +1064,7 @@ class InsuranceApp(QWidget):
     def show_help(self):
         """نمایش راهنما"""
         help_text = ShortcutManager.get_shortcuts_help()
-        help_text += "\n\n💡 نکته: میتوانید با کد خدمت جستجو کنید"
+        help_text += "\n\n💡 نکته: میتوانید با کد خدمت جستجو کنید (کد کامل + Enter = افزودن مستقیم)"
         help_text += "\n\n💉 بیحسی موضعی: 20% به خصوصی آزاد اضافه میشود"
         help_text += "\n\n💰 هزینه متفرقه: برای افزودن هزینههای اضافی مانند اتاق، ویزیت و..."
         help_text += "\n\n📋 نسخه الکترونیک: برای دریافت نسخه از سایت تامین، روی 'نسخه' کلیک کنید"
@@ -995,34 +1083,9 @@ class InsuranceApp(QWidget):
         try:
             if excel_path and os.path.exists(excel_path):
                 self.excel_path = excel_path
-                self.load_excel()
-
-                # بازسازی لیست خدمات
-                self.service_list.clear()
-                self.header_item = QListWidgetItem("📋 لیست خدمات (Shift+Click = چندتایی)")
-                self.header_item.setFlags(
-                    self.header_item.flags() & ~Qt.ItemFlag.ItemIsSelectable & ~Qt.ItemFlag.ItemIsEnabled
-                )
-                header_font = QFont("Vazirmatn", self.font_size + 2, QFont.Weight.Bold)
-                self.header_item.setFont(header_font)
-                self.service_list.addItem(self.header_item)
-
-                self.service_codes.clear()
-                for idx, row in self.df.iterrows():
-                    service_name = str(row[self.name_col])
-                    if not service_name or service_name == 'nan':
-                        continue
-
-                    service_code = str(row.get('کدملی', ''))
-                    if service_code and service_code != 'nan' and service_code != '':
-                        service_code = service_code.replace('.0', '').strip()
-                        display_text = f"{service_code} - {service_name}"
-                        self.service_codes[service_code] = service_name
-                    else:
-                        display_text = service_name
-
-                    self.service_list.addItem(QListWidgetItem(display_text))
 
+                # بازسازی لیست خدمات (از همان کش کاتالوگ)
+                self.reload_catalog()
                 self.apply_colors()
 
             if logo:
@@ -1041,13 +1104,14 @@ class InsuranceApp(QWidget):
                 self.setFont(QFont("Vazirmatn", font_size))
                 self.table.setFont(QFont("Vazirmatn", font_size))
                 self.service_list.setFont(QFont("Vazirmatn", font_size))
+                self.service_model.set_header_style(font=QFont("Vazirmatn", font_size + 2, QFont.Weight.Bold))
 
             # ذخیره تنظیمات بعد از تغییرات
             self.save_settings()
 
             # بارگذاری مجدد calculator
             coefficients = PriceCalculator.load_coefficients_from_file()
-            self.calculator = PriceCalculator(coefficients)
+            self.set_coefficients(coefficients)
 
         except Exception as e:
             QMessageBox.critical(self, "خطا", f"❌ خطا در اعمال تنظیمات:\n{str(e)}")
@@ -1066,8 +1130,10 @@ class InsuranceApp(QWidget):
                     'table_header': '#0077b6'
                 }
 
-            self.header_item.setBackground(QColor(colors['table_header']))
-            self.header_item.setForeground(QColor("#ffffff"))
+            self.service_model.set_header_style(
+                background=QColor(colors['table_header']),
+                foreground=QColor("#ffffff")
+            )
 
             self.setStyleSheet(f"""
                 QWidget {{background-color: {colors['background']}; color: {colors['text']};}}
@@ -1089,9 +1155,9 @@ class InsuranceApp(QWidget):
                 }}
                 QComboBox, QSpinBox {{background-color: #fff; border: 2px solid #e0e6ed; padding: 8px; border-radius: 8px;}}
                 QCheckBox {{font-size: 11px; padding: 8px;}}
-                QListWidget {{background-color: #fff; border: 2px solid #e0e6ed; border-radius: 10px; padding: 0;}}
-                QListWidget::item {{padding: 12px;}}
-                QListWidget::item:selected {{background-color: {colors['button']}; color: white; border-radius: 6px;}}
+                QListView {{background-color: #fff; border: 2px solid #e0e6ed; border-radius: 10px; padding: 0;}}
+                QListView::item {{padding: 12px;}}
+                QListView::item:selected {{background-color: {colors['button']}; color: white; border-radius: 6px;}}
                 QTableWidget {{background-color: #fff; border: 2px solid #e0e6ed; border-radius: 10px;}}
                 QTableWidget QHeaderView::section {{background-color: {colors['table_header']}; color: white; padding: 12px; font-weight: 700;}}
             """)
@@ -5,19 +5,29 @@
 import os
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
-    QPushButton, QTableWidget, QTableWidgetItem, 
+    QPushButton, QTableView, QHeaderView,
     QGroupBox, QMessageBox
 )
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QFont
 
+from patient_records import invoices_page
+from patient_results_model import InvoiceHistoryModel, ButtonDelegate, OPEN_COLUMN
+
 
 class PatientHistoryDialog(QDialog):
     """پنجره نمایش سوابق بیمار"""
     
-    def __init__(self, parent, patient_summary):
+    def __init__(self, parent, patient_summary, patient_records=None):
+        """
+        Args:
+            patient_summary: خلاصه بیمار (get_patient_summary - فاکتورها لازم نیست)
+            patient_records: مدیریت سوابق برای خواندن صفحه‌به‌صفحه فاکتورها؛
+                بدون آن از patient_summary['invoices'] استفاده می‌شود
+        """
         super().__init__(parent)
         self.patient_summary = patient_summary
+        self.patient_records = patient_records
         self.setWindowTitle(f"📋 سوابق بیمار: {patient_summary['name']}")
         self.setLayoutDirection(Qt.LayoutDirection.RightToLeft)
         self.resize(900, 600)
@@ -56,30 +66,25 @@ class PatientHistoryDialog(QDialog):
         invoices_group = QGroupBox("📋 لیست فاکتورها")
         invoices_layout = QVBoxLayout()
         
-        self.invoices_table = QTableWidget()
-        self.invoices_table.setColumnCount(6)
-        self.invoices_table.setHorizontalHeaderLabels([
-            "تاریخ", "کد پیگیری", "نوع تعرفه", 
-            "جمع کل", "سهم بیمار", "عملیات"
-        ])
+        # (جدیدترین اول؛ صفحه‌های بعدی هنگام اسکرول خوانده می‌شوند)
+        self.invoices_model = InvoiceHistoryModel(
+            self.fetch_invoices_page, self.patient_summary['total_invoices'], self
+        )
+        self.invoices_table = QTableView()
+        self.invoices_table.setModel(self.invoices_model)
         self.invoices_table.setFont(QFont("Vazirmatn", 10))
+        self.invoices_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.invoices_table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.invoices_table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
         
-        # پر کردن جدول
-        for invoice in reversed(self.patient_summary['invoices']):
-            row = self.invoices_table.rowCount()
-            self.invoices_table.insertRow(row)
-            
-            self.invoices_table.setItem(row, 0, QTableWidgetItem(invoice['date']))
-            self.invoices_table.setItem(row, 1, QTableWidgetItem(invoice['tracking_code']))
-            self.invoices_table.setItem(row, 2, QTableWidgetItem(invoice['tariff_type']))
-            self.invoices_table.setItem(row, 3, QTableWidgetItem(f"{invoice['total']:,}"))
-            self.invoices_table.setItem(row, 4, QTableWidgetItem(f"{invoice['patient_pay']:,}"))
-            
-            # دکمه باز کردن PDF
-            btn_open = QPushButton("📄 مشاهده")
-            btn_open.clicked.connect(lambda ch, path=invoice['pdf_path']: self.open_pdf(path))
-            self.invoices_table.setCellWidget(row, 5, btn_open)
+        # دکمه باز کردن PDF
+        self.open_delegate = ButtonDelegate(self.invoices_table)
+        self.open_delegate.clicked.connect(self.on_open_clicked)
+        self.invoices_table.setItemDelegateForColumn(OPEN_COLUMN, self.open_delegate)
         
+        # اندازه ستونها فقط بر اساس صفحه اول
+        if self.invoices_model.canFetchMore():
+            self.invoices_model.fetchMore()
         self.invoices_table.resizeColumnsToContents()
         invoices_layout.addWidget(self.invoices_table)
         invoices_group.setLayout(invoices_layout)
@@ -92,6 +97,20 @@ class PatientHistoryDialog(QDialog):
         
         self.setLayout(layout)
     
+    def fetch_invoices_page(self, offset, limit):
+        """یک صفحه از فاکتورها (جدیدترین اول)"""
+        if self.patient_records is not None:
+            return self.patient_records.get_invoices_page(
+                self.patient_summary['national_code'], offset, limit
+            )
+        return invoices_page(self.patient_summary.get('invoices', []), offset, limit)
+    
+    def on_open_clicked(self, row):
+        """کلیک روی دکمه مشاهده یک فاکتور"""
+        invoice = self.invoices_model.invoice(row)
+        if invoice:
+            self.open_pdf(invoice['pdf_path'])
+    
     def open_pdf(self, pdf_path):
         """باز کردن فایل PDF"""
         try:
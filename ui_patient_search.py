@@ -5,12 +5,15 @@
 import os
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
-    QPushButton, QLineEdit, QTableWidget, QTableWidgetItem,
+    QPushButton, QLineEdit, QTableView,
     QMessageBox, QHeaderView
 )
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QFont
 
+from patient_search_service import PatientSearchService
+from patient_results_model import PatientResultsModel, ButtonDelegate, SELECT_COLUMN
+
 
 class PatientSearchDialog(QDialog):
     """پنجره جستجوی بیمار"""
@@ -26,6 +29,11 @@ class PatientSearchDialog(QDialog):
         self.resize(900, 600)
         self.init_ui()
         
+        # جستجوی پسزمینه (با تاخیر بعد از آخرین کلید)
+        self.search_service = PatientSearchService(self.patient_records, parent=self)
+        self.search_service.results_ready.connect(self.on_search_results)
+        self.finished.connect(self.search_service.stop)
+        
         # بارگذاری اولیه آخرین بیماران
         self.load_recent_patients()
     
@@ -54,16 +62,21 @@ class PatientSearchDialog(QDialog):
         layout.addWidget(help_label)
         
         # جدول نتایج
-        self.results_table = QTableWidget()
-        self.results_table.setColumnCount(6)
-        self.results_table.setHorizontalHeaderLabels([
-            "نام و نام خانوادگی", "کد ملی", "بیمه", 
-            "تعداد مراجعات", "آخرین مراجعه", "عملیات"
-        ])
+        # (مدل + delegate: فقط ردیفهای قابل مشاهده ساخته و کشیده میشوند)
+        self.results_model = PatientResultsModel(self)
+        self.results_table = QTableView()
+        self.results_table.setModel(self.results_model)
         self.results_table.setFont(QFont("Vazirmatn", 10))
         self.results_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
-        self.results_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.results_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.results_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.results_table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.results_table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
+        self.results_table.setMouseTracking(True)
+        
+        # دکمه انتخاب در ستون عملیات
+        self.select_delegate = ButtonDelegate(self.results_table)
+        self.select_delegate.clicked.connect(self.on_select_clicked)
+        self.results_table.setItemDelegateForColumn(SELECT_COLUMN, self.select_delegate)
         self.results_table.doubleClicked.connect(self.on_row_double_clicked)
         
         layout.addWidget(self.results_table)
@@ -100,42 +113,31 @@ class PatientSearchDialog(QDialog):
         """جستجوی بیماران"""
         if len(text.strip()) < 2:
             # اگر کمتر از 2 حرف، نمایش آخرین بیماران
+            self.search_service.cancel()
             self.load_recent_patients()
             return
         
-        results = self.patient_records.search_by_name(text)
+        # جستجو در thread جدا؛ نتیجه با on_search_results میرسد
+        self.search_service.request(text)
+    
+    def on_search_results(self, query, results):
+        """نتیجه آخرین جستجو"""
         self.display_results(results)
     
     def display_results(self, patients):
-        """نمایش نتایج در جدول"""
-        self.results_table.setRowCount(0)
-        
-        if not patients:
-            return
-        
-        for patient in patients:
-            row = self.results_table.rowCount()
-            self.results_table.insertRow(row)
-            
-            # نام
-            self.results_table.setItem(row, 0, QTableWidgetItem(patient['name']))
-            
-            # کد ملی
-            self.results_table.setItem(row, 1, QTableWidgetItem(patient['national_code']))
-            
-            # بیمه
-            self.results_table.setItem(row, 2, QTableWidgetItem(patient['insurance']))
-            
-            # تعداد مراجعات
-            self.results_table.setItem(row, 3, QTableWidgetItem(str(patient['total_invoices'])))
-            
-            # آخرین مراجعه
-            self.results_table.setItem(row, 4, QTableWidgetItem(patient['last_visit']))
-            
-            # دکمه انتخاب
-            btn_select = QPushButton("✅ انتخاب")
-            btn_select.clicked.connect(lambda ch, p=patient: self.emit_patient_data(p))
-            self.results_table.setCellWidget(row, 5, btn_select)
+        """نمایش نتایج در جدول (ردیفهای بیشتر هنگام اسکرول اضافه میشوند)"""
+        self.results_model.set_patients(patients)
+    
+    def on_select_clicked(self, row):
+        """کلیک روی دکمه انتخاب یک ردیف"""
+        patient = self.results_model.patient(row)
+        if patient:
+            self.emit_patient_data(patient)
+    
+    def current_national_code(self):
+        """کدملی ردیف انتخاب شده (یا None)"""
+        patient = self.results_model.patient(self.results_table.currentIndex().row())
+        return patient['national_code'] if patient else None
     
     def clear_search(self):
         """پاک کردن جستجو"""
@@ -144,13 +146,12 @@ class PatientSearchDialog(QDialog):
     
     def select_patient(self):
         """انتخاب بیمار از ردیف فعلی"""
-        current_row = self.results_table.currentRow()
+        national_code = self.current_national_code()
         
-        if current_row < 0:
+        if national_code is None:
             QMessageBox.warning(self, "خطا", "⚠️ لطفاً یک بیمار را انتخاب کنید!")
             return
         
-        national_code = self.results_table.item(current_row, 1).text()
         patient = self.patient_records.get_patient_summary(national_code)
         
         if patient:
@@ -167,19 +168,18 @@ class PatientSearchDialog(QDialog):
     
     def view_full_history(self):
         """مشاهده سوابق کامل"""
-        current_row = self.results_table.currentRow()
+        national_code = self.current_national_code()
         
-        if current_row < 0:
+        if national_code is None:
             QMessageBox.warning(self, "خطا", "⚠️ لطفاً یک بیمار را انتخاب کنید!")
             return
         
-        national_code = self.results_table.item(current_row, 1).text()
-        patient = self.patient_records.get_patient_summary(national_code)
+        patient = self.patient_records.get_patient_summary(national_code, include_invoices=False)
         
         if patient:
             try:
                 from ui_patient_history import PatientHistoryDialog
-                dialog = PatientHistoryDialog(self, patient)
+                dialog = PatientHistoryDialog(self, patient, self.patient_records)
                 dialog.exec()
             except ImportError:
                 QMessageBox.warning(self, "خطا", "⚠️ ماژول نمایش سوابق یافت نشد!")
@@ -521,9 +521,8 @@ class SettingsDialog(QDialog):
             with open('coefficients.json', 'w', encoding='utf-8') as f:
                 json.dump(coefficients, f, ensure_ascii=False, indent=2)
             
-            # بارگذاری مجدد ماژول محاسبه
-            from calculator import PriceCalculator
-            self.parent.calculator = PriceCalculator(coefficients)
+            # بارگذاری مجدد ماژول محاسبه + قیمت‌های لیست خدمات
+            self.parent.set_coefficients(coefficients)
             
             # ذخیره رنگها
             colors = {
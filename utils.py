@@ -1,5 +1,7 @@
 import sys
 import os
+import threading
+from functools import lru_cache
 import pandas as pd
 import arabic_reshaper
 from bidi.algorithm import get_display
@@ -20,6 +22,80 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
+def write_bytes_atomic(path, data):
+    """
+    نوشتن اتمیک فایل: فایل موقت در همان پوشه + جایگزینی
+    (فایل نیمه‌نوشته هیچ‌وقت با نام نهایی دیده نمی‌شود)
+    """
+    # نام یکتا برای هر پردازه/thread (mkstemp مجوز فایل را به 600 محدود می‌کرد)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_bytes_exclusive(paths, data):
+    """
+    نوشتن اتمیک data با اولین نام آزاد از paths (فایل موجود هیچ‌وقت بازنویسی نمی‌شود)
+
+    فایل موقت با hardlink به نام نهایی وصل می‌شود؛ اگر نام گرفته شده باشد نام بعدی امتحان
+    می‌شود. در سیستم فایل بدون hardlink، نام با O_EXCL رزرو و بعد جایگزین می‌شود.
+
+    Returns:
+        str: مسیر نهایی فایل
+    """
+    paths = iter(paths)
+    path = next(paths)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        while True:
+            try:
+                os.link(tmp_path, path)
+                return path
+            except FileExistsError:
+                pass
+            except OSError:
+                try:
+                    open(path, "xb").close()
+                except FileExistsError:
+                    path = next(paths)
+                    continue
+                os.replace(tmp_path, path)
+                return path
+            path = next(paths)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def link_or_write(source_path, path, data):
+    """
+    ساخت path به صورت hardlink به source_path (بدون کپی محتوا)؛
+    اگر سیستم فایل اجازه ندهد (پوشه‌های روی درایو دیگر، FAT، ...) data نوشته می‌شود
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.link"
+    try:
+        os.link(source_path, tmp_path)
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        write_bytes_atomic(path, data)
+        return False
+
+
 def int_from_string(s):
     """تبدیل رشته به عدد صحیح"""
     if pd.isna(s):
@@ -32,12 +108,56 @@ def int_from_string(s):
         return 0
 
 
+def normalize_text(txt):
+    """نرمالسازی متن فارسی"""
+    return txt.replace("ي", "ی").replace("ك", "ک").strip().lower()
+
+
+# حرکات عربی (فتحه، کسره، تنوین، تشدید، ...) + الف کوچک + کشیده
+_PERSIAN_MARKS = [*range(0x064B, 0x0660), 0x0670, 0x0640]
+_PERSIAN_MAP = str.maketrans({
+    "ي": "ی", "ى": "ی", "ك": "ک",
+    "\u200c": None,  # نیم‌فاصله
+    **{chr(c): None for c in _PERSIAN_MARKS},
+})
+
+
+def normalize_persian(txt):
+    """نرمالسازی نام فارسی برای جستجو (ی/ي، ک/ك، حذف نیمفاصله و اعراب)"""
+    return str(txt).translate(_PERSIAN_MAP).strip().lower()
+
+
+# حداکثر تعداد متن‌های شکل‌داده‌شده در حافظه (برچسب‌ها، نام خدمات، تعرفه‌ها، مبالغ)
+SHAPE_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def shape_text(text, reshape=True):
+    """
+    reshape + bidi یک متن (مشترک بین rtl، rtl_no_reshape و persian_text فاکتور)
+    نتیجه در کش LRU نگه داشته می‌شود؛ متن‌های تکراری دوباره پردازش نمی‌شوند
+    """
+    if reshape:
+        text = arabic_reshaper.reshape(text)
+    return get_display(text)
+
+
+def shape_cache_stats():
+    """آمار کش شکل‌دهی متن: hits، misses، size و hit_rate"""
+    info = shape_text.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'hit_rate': info.hits / lookups if lookups else 0.0,
+    }
+
+
 def rtl(text):
     """تبدیل متن فارسی به جهت صحیح نمایش در PDF"""
     try:
-        reshaped_text = arabic_reshaper.reshape(str(text))
-        bidi_text = get_display(reshaped_text)
-        return bidi_text
+        return shape_text(str(text))
     except Exception:
         return str(text)
 
@@ -46,7 +166,7 @@ def rtl_no_reshape(text):
     """تبدیل متن فارسی بدون reshape - برای متن‌های ترکیبی با اعداد"""
     try:
         # فقط از bidi استفاده می‌کنیم بدون reshape
-        return get_display(str(text))
+        return shape_text(str(text), reshape=False)
     except Exception:
         return str(text)
 